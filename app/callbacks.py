@@ -1,14 +1,30 @@
-from dash import Input, Output, State, callback
+import logging
+import os
+
+from dash import MATCH, Input, Output, State, callback, ctx, no_update
 from dash.exceptions import PreventUpdate
 
 from models.forecast import Forecast
-from utils.data_loader import parse_csv_contents
+from models.forecast_store import default_forecast_store
+from models.job_queue import default_queue, QUEUED, DONE, FAILED, CANCELLED, FINISHED
+from utils.dataset_store import default_store
+from utils.telemetry import span
 from utils.visuals import (
     create_metrics_table,
+    forecast_figure,
+    max_points_for_width,
+    plot_time_series,
     plot_residuals,
-    plot_combined_forecasts
+    plot_combined_forecasts,
+    residual_figure
 )
 
+logger = logging.getLogger(__name__)
+
+# The result graphs are created by the forecast callbacks, so they use pattern-matching IDs
+FORECAST_GRAPH_ID = {'type': 'result-graph', 'plot': 'forecast'}
+RESIDUAL_GRAPH_ID = {'type': 'result-graph', 'plot': 'residuals'}
+
 def register_callbacks(app):
     @app.callback(
         Output('model-select', 'options'),
@@ -34,94 +50,278 @@ def register_callbacks(app):
         ensemble_options = Forecast.get_ensemble_options(selected_models)
         return [{'label': opt, 'value': opt} for opt in ensemble_options]
     
+    # Report the browser width so plots are downsampled to what can be drawn
+    app.clientside_callback(
+        "function(_) { return window.innerWidth; }",
+        Output('viewport-width', 'data'),
+        Input('upload-data', 'filename')
+    )
+
     @callback(
         Output('timeseries-plot', 'figure'),
+        Output('dataset-id', 'data'),
+        Output('upload-data', 'contents'),
         Input('upload-data', 'contents'),
+        State('upload-data', 'filename'),
+        State('viewport-width', 'data'),
         prevent_initial_call=True
     )
-    def update_time_series(contents):
+    def update_time_series(contents, filename, width):
         if contents is None:
             raise PreventUpdate
 
-        df = parse_csv_contents(contents)
-
-        from plotly.graph_objs import Figure, Scatter, Layout
-        fig = Figure()
-        fig.add_trace(Scatter(
-            x=df['date'],
-            y=df['value'],
-            mode='lines',
-            name='Time Series Data'
-        ))
-        fig.update_layout(
-            title="Time Series Data", 
-            xaxis_title="Date", 
-            yaxis_title="Value"
-        )
-        return fig
+        # Parse once on the server; the browser keeps only the dataset ID
+        dataset_id = default_store().put_contents(contents, filename)
+        df = default_store().get(dataset_id)
 
+        with span('preview_figure', length=len(df)):
+            fig = plot_time_series(df, max_points_for_width(width), uirevision=dataset_id)
+        # Clear the upload so the base64 payload is not kept or re-sent by the browser
+        return fig, dataset_id, None
 
     @callback(
-        Output('forecast-metrics', 'children'),
-        Output('forecast-graphs', 'children'),
-        Output('residual-plots', 'children'),
+        Output('timeseries-plot', 'figure', allow_duplicate=True),
+        Input('timeseries-plot', 'relayoutData'),
+        State('dataset-id', 'data'),
+        State('viewport-width', 'data'),
+        prevent_initial_call=True
+    )
+    def zoom_time_series(relayout, dataset_id, width):
+        # Re-request detail for the visible range after a zoom or pan
+        if dataset_id is None:
+            raise PreventUpdate
+        x_range = relayout_range(relayout)
+
+        df = default_store().get(dataset_id)
+        return plot_time_series(df, max_points_for_width(width), x_range=x_range, uirevision=dataset_id)
+
+
+    @callback(
+        Output('forecast-job-id', 'data'),
+        Output('forecast-rendered', 'data'),
+        Output('job-poll', 'disabled'),
+        Output('job-status', 'children'),
+        Output('forecast-metrics', 'children', allow_duplicate=True),
+        Output('forecast-graphs', 'children', allow_duplicate=True),
+        Output('residual-plots', 'children', allow_duplicate=True),
+        Output('forecast-source', 'data'),
         
         Input('forecast-button', 'n_clicks'),
         
         State('model-select', 'value'),
         State('forecast-horizon', 'value'),
         State('ensemble-option', 'value'),
-        State('upload-data', 'contents'),
+        State('dataset-id', 'data'),
         State('crossval-checklist', 'value'),
         State('window-type-radio', 'value'),
+        State('viewport-width', 'data'),
         prevent_initial_call=True
     )
-    def run_forecast(n_clicks, models, horizon, ensemble_opt, contents, cv_checklist, window_type):
-        if n_clicks is None or contents is None or not models:
+    def run_forecast(n_clicks, models, horizon, ensemble_opt, dataset_id, cv_checklist, window_type, width):
+        if n_clicks is None or dataset_id is None or not models:
             raise PreventUpdate
 
-        # Parse the uploaded data
-        df = parse_csv_contents(contents)
+        # Look up the already parsed upload
+        df = default_store().get(dataset_id)
         
         # Set flags based on UI selections
         ensemble_flag = 'ensemble' in ensemble_opt if ensemble_opt else False
         cross_validate = 'cv_on' in cv_checklist
+        race = 'race' in cv_checklist
         
-        # Display what we're doing
-        print(f"\nRunning forecast with:")
-        print(f"Models: {models}")
-        print(f"Horizon: {horizon} days")
-        print(f"Ensemble: {ensemble_flag}")
-        print(f"Cross-validate: {cross_validate}")
-        print(f"Window type: {window_type}")
-
-        # Create forecast object and run the forecast
-        forecast_obj = Forecast(models=models, ensemble=ensemble_flag)
-        results = forecast_obj.fit_and_forecast(
-            df, 
+        series_id = series_id_for(dataset_id)
+        fit_kwargs = dict(cross_validate=cross_validate, window_type=window_type, race=race,
+                          #stride=max(1, int(horizon/3))  # Use dynamic stride based on horizon
+                          stride=1)
+
+        # Serve a forecast precomputed for this data and these settings, if there is one
+        source = {'dataset_id': dataset_id, 'models': models, 'n_days': int(horizon), 'ensemble': ensemble_flag,
+                  'fit_kwargs': fit_kwargs}
+        with span('store_lookup', models=len(models)):
+            results = load_results(source, df)
+        if results is not None:
+            logger.info("Serving stored forecast for %s: models=%s horizon=%s", series_id, models, horizon)
+            with span('render', models=len(results['metrics'])):
+                metrics_table, combined_plots, residual_plots = render_results(results, max_points_for_width(width))
+            return (None, len(results['metrics']), True, "Loaded precomputed forecast",
+                    metrics_table, combined_plots, residual_plots, source)
+
+        logger.info("Running forecast: models=%s horizon=%s ensemble=%s cross_validate=%s window_type=%s race=%s",
+                    models, horizon, ensemble_flag, cross_validate, window_type, race)
+
+        # Queue the run; the browser polls for progress and collects the results
+        job_id = default_queue().submit(
+            df,
+            models=models,
             n_days=int(horizon),
-            cross_validate=cross_validate,
-            window_type=window_type,
-            #stride=max(1, int(horizon/3))  # Use dynamic stride based on horizon
-            stride = 1
+            ensemble=ensemble_flag,
+            series_id=series_id,
+            **fit_kwargs
         )
+        return job_id, 0, False, "Forecast queued...", no_update, no_update, no_update, {'job_id': job_id}
+
+    @callback(
+        Output('forecast-metrics', 'children'),
+        Output('forecast-graphs', 'children'),
+        Output('residual-plots', 'children'),
+        Output('forecast-rendered', 'data', allow_duplicate=True),
+        Output('job-poll', 'disabled', allow_duplicate=True),
+        Output('job-status', 'children', allow_duplicate=True),
+        
+        Input('job-poll', 'n_intervals'),
+        
+        State('forecast-job-id', 'data'),
+        State('forecast-rendered', 'data'),
+        State('viewport-width', 'data'),
+        prevent_initial_call=True
+    )
+    def poll_forecast(n_intervals, job_id, rendered, width):
+        if job_id is None:
+            raise PreventUpdate
+
+        job = default_queue().status(job_id)
+        if job is None:
+            return no_update, no_update, no_update, no_update, True, "Forecast job not found"
+
+        if job['status'] == DONE:
+            status = "Forecast finished"
+            peak = (job['progress'] or {}).get('peak_rss')
+            if peak:
+                status += f" (peak memory {peak / 2**20:.0f} MiB)"
+        elif job['status'] == FAILED:
+            status = f"Forecast failed: {job['error']}"
+        elif job['status'] == CANCELLED:
+            status = "Forecast cancelled"
+        else:
+            status = describe_progress(job)
+        polling_disabled = job['status'] in FINISHED
 
-        # Create the metrics table
-        metrics_table = create_metrics_table(results['metrics'])
+        # Redraw only when another model has finished since the last render
+        ready = len(job['progress']['ready']) if job['progress'] else 0
+        if ready <= (rendered or 0):
+            return no_update, no_update, no_update, no_update, polling_disabled, status
 
-        # Create the forecast plots
+        results = default_queue().result(job_id)
+        with span('render', models=ready):
+            metrics_table, combined_plots, residual_plots = render_results(results, max_points_for_width(width))
+        return metrics_table, combined_plots, residual_plots, ready, polling_disabled, status
+
+    @callback(
+        Output({'type': 'result-graph', 'plot': MATCH}, 'figure'),
+        Input({'type': 'result-graph', 'plot': MATCH}, 'relayoutData'),
+        State('forecast-source', 'data'),
+        State('viewport-width', 'data'),
+        prevent_initial_call=True
+    )
+    def zoom_results(relayout, source, width):
+        # Redraw the zoomed forecast or residual plot at full budget for the visible range
+        if not source:
+            raise PreventUpdate
+        x_range = relayout_range(relayout)
+
+        results = load_results(source)
+        if results is None:
+            raise PreventUpdate
+        max_points = max_points_for_width(width)
+        if ctx.triggered_id['plot'] == 'forecast':
+            fig = forecast_figure(results['val_truth'], results['val_forecasts'], results['forecasts'],
+                                  max_points, x_range)
+        else:
+            fig = residual_figure(results['val_truth'], _scored_forecasts(results), max_points, x_range)
+        if fig is None:
+            raise PreventUpdate
+        return fig
+
+    @callback(
+        Output('job-status', 'children', allow_duplicate=True),
+        Input('cancel-button', 'n_clicks'),
+        State('forecast-job-id', 'data'),
+        prevent_initial_call=True
+    )
+    def cancel_forecast(n_clicks, job_id):
+        if n_clicks is None or job_id is None:
+            raise PreventUpdate
+
+        job = default_queue().status(job_id)
+        if job is None or job['status'] in FINISHED:
+            raise PreventUpdate
+
+        default_queue().cancel(job_id)
+        return "Cancelling..."
+
+
+def relayout_range(relayout):
+    """
+    The x range a zoom or pan selected, from a graph's relayoutData; None after
+    a reset to the full range. Raises PreventUpdate for other relayouts.
+    """
+    if not relayout:
+        raise PreventUpdate
+    if relayout.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout:
+        return relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    if 'xaxis.range' in relayout:
+        return tuple(relayout['xaxis.range'])
+    raise PreventUpdate
+
+
+def load_results(source, df=None):
+    """
+    The results described by a 'forecast-source' entry: a queued job's (the
+    models finished so far), or a stored forecast's. None if there are none.
+    """
+    if source.get('job_id'):
+        return default_queue().result(source['job_id'])
+    if df is None:
+        df = default_store().get(source['dataset_id'])
+    forecast = Forecast(source['models'], ensemble=source['ensemble'], store=default_forecast_store())
+    return forecast.stored_results(df, source['n_days'], series_id_for(source['dataset_id']), **source['fit_kwargs'])
+
+
+def series_id_for(dataset_id):
+    """Forecast store ID of an upload: its file name without extension, as the batch CLI names series."""
+    filename = default_store().metadata(dataset_id).get('filename')
+    return os.path.splitext(os.path.basename(filename))[0] if filename else dataset_id
+
+
+def describe_progress(job):
+    """One-line status for a queued or running job, with per-model fit counts."""
+    progress = job['progress']
+    if job['status'] == QUEUED or not progress:
+        return "Forecast queued..."
+    per_model = ", ".join(f"{name} {counts['done']}/{counts['total']}" for name, counts in progress['models'].items())
+    status = f"Running: {progress['done']}/{progress['total']} fits ({per_model})"
+    if progress['ready']:
+        status += f" - ready: {', '.join(progress['ready'])}"
+    return status
+
+
+def render_results(results, max_points):
+    """Build the metrics table, forecast plots and residual plots for the models finished so far."""
+    # Create the metrics table
+    metrics_table = create_metrics_table(results['metrics'])
+
+    # Create the forecast plots
+    with span('figures', models=len(results['forecasts'])):
         combined_plots = plot_combined_forecasts(
             results['val_truth'],
             results['val_forecasts'],
-            results['forecasts']
+            results['forecasts'],
+            max_points,
+            FORECAST_GRAPH_ID
         )
 
-        # Create residual plots
-        residual_plots = []
-        
-        for model_name, forecast_ts in results['val_forecasts']:
-            if forecast_ts is not None and len(forecast_ts) > 0:
-                residual_plot = plot_residuals(results['val_truth'], forecast_ts, model_name)
-                residual_plots.append(residual_plot)
+    # Create the residual plot, one trace per model
+    val_forecasts = _scored_forecasts(results)
+    residual_plots = []
+    if val_forecasts:
+        with span('residual_plot', models=len(val_forecasts)):
+            residual_plots.append(plot_residuals(results['val_truth'], val_forecasts, max_points, RESIDUAL_GRAPH_ID))
+
+    return metrics_table, combined_plots, residual_plots
+
 
-        return metrics_table, combined_plots, residual_plots
\ No newline at end of file
+def _scored_forecasts(results):
+    """The non-empty (model, validation forecast) pairs of a result, for the residual plot."""
+    return [(name, f) for name, f in results['val_forecasts'] if f is not None and len(f) > 0]
@@ -21,6 +21,10 @@ layout = html.Div([
                 'margin': '10px 0'
             }
         ),
+        # ID of the parsed upload in the server-side dataset store
+        dcc.Store(id='dataset-id'),
+        # Browser width in pixels, used to size the plot point budget
+        dcc.Store(id='viewport-width'),
     ], style={'padding': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'marginBottom': '20px'}),
 
     # Time series plot
@@ -78,7 +82,8 @@ layout = html.Div([
             html.Div([
                 dcc.Checklist(
                     id='crossval-checklist',
-                    options=[{'label': ' Enable Cross-Validation', 'value': 'cv_on'}],
+                    options=[{'label': ' Enable Cross-Validation', 'value': 'cv_on'},
+                             {'label': ' Race models (drop clear losers early)', 'value': 'race'}],
                     value=[]
                 ),
             ], style={'marginBottom': '10px'}),
@@ -112,7 +117,29 @@ layout = html.Div([
                 'fontSize': '16px',
                 'marginTop': '10px'
             }
-        )
+        ),
+        html.Button(
+            'Cancel',
+            id='cancel-button',
+            style={
+                'padding': '10px 20px',
+                'border': '1px solid #ddd',
+                'borderRadius': '5px',
+                'cursor': 'pointer',
+                'fontSize': '16px',
+                'marginTop': '10px',
+                'marginLeft': '10px'
+            }
+        ),
+        html.Div(id='job-status', style={'marginTop': '10px'}),
+
+        # Background forecast job: its ID, how many of its models are on screen,
+        # and the timer that polls its progress
+        dcc.Store(id='forecast-job-id'),
+        # Where the results on screen came from (job ID or stored-result request), for zoom redraws
+        dcc.Store(id='forecast-source'),
+        dcc.Store(id='forecast-rendered', data=0),
+        dcc.Interval(id='job-poll', interval=1000, disabled=True)
     ], style={'padding': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'marginBottom': '20px'}),
 
     html.Hr(),
@@ -0,0 +1,83 @@
+# cap_poc/benchmarks/bench_cv.py
+#
+# Cross-validation cost of ExponentialSmoothing and Theta: one darts fit per
+# backtest window (run_backtest) versus the batched recursions in
+# models.fast_backtest, with the backtest error of each so the accuracy
+# traded for speed is visible. The last column is the largest deviation from
+# the refit forecasts, which must be 0 for --refit-growth 0.
+#
+#   python -m benchmarks.bench_cv --length 365 1000 --horizon 14
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+
+from models.backtest import backtest_schedule, window_bounds, run_backtest
+from models.fast_backtest import REFIT_GROWTH, fast_backtest
+from models.model_factory import get_model
+
+# An explicit season keeps darts' minimum training length in line with what
+# statsmodels needs for the seasonal initialization of short windows
+MODELS = {
+    'exponentialsmoothing': ('exponentialsmoothing', {'seasonal_periods': 7}),
+    'es multiplicative': ('exponentialsmoothing', {'seasonal_periods': 7, 'trend': 'multiplicative',
+                                                    'seasonal': 'multiplicative'}),
+    'theta': ('theta', None),
+}
+
+
+def make_series(length: int) -> TimeSeries:
+    """Daily CPU-like series: slow random walk, weekly cycle and noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(length)
+    values = 50 + np.cumsum(rng.normal(0, 0.2, length)) + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 1, length)
+    dates = pd.date_range('2024-01-01', periods=length, freq='D')
+    return TimeSeries.from_times_and_values(dates, values, columns=['value'])
+
+
+def backtest_mae(series: TimeSeries, forecasts) -> float:
+    errors = [np.abs(series.slice_intersect(f).values() - f.slice_intersect(series).values()).mean()
+              for f in forecasts if f.start_time() <= series.end_time()]
+    return float(np.mean(errors))
+
+
+def max_deviation(forecasts, reference) -> float:
+    return float(max(np.abs(f.values() - r.values()).max() for f, r in zip(forecasts, reference)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, nargs='+', default=[365, 1000])
+    parser.add_argument('--horizon', type=int, default=14)
+    parser.add_argument('--refit-growth', type=float, nargs='+', default=[REFIT_GROWTH, 1.0])
+    args = parser.parse_args()
+
+    print(f"{'length':>7} {'model':>21} {'engine':>12} {'seconds':>8} {'speedup':>8} {'MAE':>8} {'max dev':>8}")
+    for length in args.length:
+        series = make_series(length)
+        start, stride = backtest_schedule(length, args.horizon)
+        for label, (model_name, params) in MODELS.items():
+            bounds = window_bounds(length, start, stride, get_model(model_name, params).min_train_series_length)
+
+            begin = time.perf_counter()
+            refit = run_backtest(model_name, series, args.horizon, params=params, executor='serial',
+                                 last_points_only=False)
+            refit_seconds = time.perf_counter() - begin
+            print(f"{length:>7} {label:>21} {'refit':>12} {refit_seconds:>8.2f} {1.0:>8.1f} "
+                  f"{backtest_mae(series, refit):>8.4f} {0.0:>8.4f}")
+
+            for growth in args.refit_growth:
+                begin = time.perf_counter()
+                fast = fast_backtest(model_name, series, bounds, args.horizon, params, refit_growth=growth,
+                                     last_points_only=False)
+                seconds = time.perf_counter() - begin
+                print(f"{length:>7} {label:>21} {f'fast {growth:g}':>12} {seconds:>8.2f} "
+                      f"{refit_seconds / seconds:>8.1f} {backtest_mae(series, fast):>8.4f} "
+                      f"{max_deviation(fast, refit):>8.4f}")
+
+
+if __name__ == '__main__':
+    main()
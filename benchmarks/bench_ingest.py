@@ -0,0 +1,71 @@
+# cap_poc/benchmarks/bench_ingest.py
+#
+# Compare parse time and peak memory of the upload parser against the
+# original str/StringIO implementation. Peak memory comes from tracemalloc,
+# which sees Python and NumPy allocations but not Arrow's own memory pool.
+#
+#   python -m benchmarks.bench_ingest --rows 100000 1000000
+
+import argparse
+import base64
+import io
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import parse_csv_contents
+
+
+def legacy_parse_csv_contents(contents):
+    """The parser as it was before the bytes-based loader, kept for comparison."""
+    content_type, content_string = contents.split(',')
+    decoded = base64.b64decode(content_string)
+    df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+    df.columns = df.columns.str.strip().str.lower()
+    df['date'] = pd.to_datetime(df['date'])
+    df.sort_values('date', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def make_upload(rows: int) -> str:
+    """Build a Dash Upload payload holding a minute-level CPU-like series."""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2024-01-01', periods=rows, freq='min')
+    values = 50 + 20 * np.sin(np.arange(rows) * 2 * np.pi / 1440) + rng.normal(0, 5, rows)
+    csv_bytes = pd.DataFrame({'date': dates, 'value': values.round(3)}).to_csv(index=False).encode()
+    return 'data:text/csv;base64,' + base64.b64encode(csv_bytes).decode()
+
+
+def measure(fn, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--chunksize', type=int, default=250_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'parser':>10} {'seconds':>9} {'peak MB':>9}")
+    for rows in args.rows:
+        contents = make_upload(rows)
+        for label, fn, kwargs in (
+            ('legacy', legacy_parse_csv_contents, {}),
+            ('bytes', parse_csv_contents, {}),
+            ('chunked', parse_csv_contents, {'chunksize': args.chunksize}),
+        ):
+            elapsed, peak = measure(fn, contents, **kwargs)
+            print(f"{rows:>10} {label:>10} {elapsed:>9.3f} {peak:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# cap_poc/benchmarks/bench_ipc.py
+#
+# Bytes pickled into the job arguments of one cross-validation run, and the
+# process pool wall time of those jobs, when every window job carries the
+# TimeSeries itself versus a SharedSeries handle on a shared memory copy.
+# The jobs only read their window, so the timings isolate the IPC cost from
+# model fitting.
+#
+#   python -m benchmarks.bench_ipc --length 10000 100000 1000000 --horizon 24
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+
+from models.backtest import backtest_schedule, window_bounds
+from models.executor import run_jobs
+from models.shared_series import as_timeseries, share_series
+
+
+def make_series(length: int) -> TimeSeries:
+    """Hourly CPU-like series: slow random walk, daily cycle and noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(length)
+    values = 50 + np.cumsum(rng.normal(0, 0.05, length)) + 5 * np.sin(2 * np.pi * t / 24) + rng.normal(0, 1, length)
+    dates = pd.date_range('2020-01-01', periods=length, freq='h')
+    return TimeSeries.from_times_and_values(dates, values, columns=['value'])
+
+
+def window_mean(series, train_start, train_end):
+    """Stand-in for a window fit: build the training series and read it."""
+    return float(as_timeseries(series[train_start:train_end]).values(copy=False).mean())
+
+
+def make_jobs(series, bounds):
+    return [(i, window_mean, (series, train_start, train_end)) for i, (train_start, train_end) in enumerate(bounds)]
+
+
+def timed_run(jobs, max_workers):
+    begin = time.perf_counter()
+    results = run_jobs(jobs, 'process', max_workers)
+    return time.perf_counter() - begin, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--horizon', type=int, default=24)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'length':>9} {'windows':>8} {'mode':>8} {'job bytes':>12} {'seconds':>8}")
+    for length in args.length:
+        series = make_series(length)
+        start, stride = backtest_schedule(length, args.horizon)
+        bounds = window_bounds(length, start, stride, 1)
+
+        jobs = make_jobs(series, bounds)
+        pickled_bytes = sum(len(pickle.dumps(job_args)) for _, _, job_args in jobs)
+        pickled_seconds, expected = timed_run(jobs, args.workers)
+        print(f"{length:>9} {len(bounds):>8} {'pickle':>8} {pickled_bytes:>12,} {pickled_seconds:>8.2f}")
+
+        begin = time.perf_counter()
+        with share_series(series) as shared:
+            jobs = make_jobs(shared, bounds)
+            shared_bytes = sum(len(pickle.dumps(job_args)) for _, _, job_args in jobs)
+            _, results = timed_run(jobs, args.workers)
+        shared_seconds = time.perf_counter() - begin
+        assert results == expected
+        print(f"{length:>9} {len(bounds):>8} {'shared':>8} {shared_bytes:>12,} {shared_seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# cap_poc/benchmarks/bench_payload.py
+#
+# JSON payload size and serialization time of the data preview figure with
+# and without LTTB downsampling. Serialization time stands in for the server
+# side of time-to-interactive; browser rendering is not measured here.
+#
+#   python -m benchmarks.bench_payload --rows 100000 525600 --width 1200
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from utils.visuals import max_points_for_width, plot_time_series
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2024-01-01', periods=rows, freq='min')
+    values = 50 + 20 * np.sin(np.arange(rows) * 2 * np.pi / 1440) + rng.normal(0, 5, rows)
+    return pd.DataFrame({'date': dates, 'value': values})
+
+
+def full_figure(df):
+    """The preview figure as it was built before downsampling."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=df['date'], y=df['value'], mode='lines', name='Time Series Data'))
+    return fig
+
+
+def measure(build, df):
+    start = time.perf_counter()
+    payload = build(df).to_json()
+    return len(payload) / 1e6, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 525_600])
+    parser.add_argument('--width', type=int, default=1200)
+    args = parser.parse_args()
+
+    max_points = max_points_for_width(args.width)
+    print(f"{'rows':>8} {'figure':>12} {'MB':>8} {'seconds':>8}")
+    for rows in args.rows:
+        df = make_frame(rows)
+        for label, build in (
+            ('full', full_figure),
+            ('lttb', lambda d: plot_time_series(d, max_points)),
+            ('lttb zoom', lambda d: plot_time_series(d, max_points, x_range=(d['date'].iloc[0], d['date'].iloc[len(d) // 10]))),
+        ):
+            mb, seconds = measure(build, df)
+            print(f"{rows:>8} {label:>12} {mb:>8.2f} {seconds:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
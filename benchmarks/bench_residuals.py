@@ -0,0 +1,76 @@
+# cap_poc/benchmarks/bench_residuals.py
+#
+# Per-fold cost of residual alignment: the original per-date TimeSeries
+# indexing versus the index join in utils.visuals.align_residuals.
+#
+#   python -m benchmarks.bench_residuals --length 365 --folds 30
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+
+from utils.visuals import align_residuals, plot_residuals
+
+
+def legacy_align(actual_ts, forecast_ts):
+    """The alignment plot_residuals used before, kept for comparison."""
+    overlap_start = max(actual_ts.start_time(), forecast_ts.start_time())
+    overlap_end = min(actual_ts.end_time(), forecast_ts.end_time())
+    actual_aligned = actual_ts.slice(overlap_start, overlap_end)
+    forecast_aligned = forecast_ts.slice(overlap_start, overlap_end)
+    if len(actual_aligned) != len(forecast_aligned):
+        common_dates = sorted(set(actual_aligned.time_index).intersection(set(forecast_aligned.time_index)))
+        actual_values = [actual_aligned[date].values()[0][0] for date in common_dates]
+        forecast_values = [forecast_aligned[date].values()[0][0] for date in common_dates]
+        return common_dates, np.array(actual_values) - np.array(forecast_values)
+    return actual_aligned.time_index, (actual_aligned - forecast_aligned).values().flatten()
+
+
+def make_folds(length: int, folds: int, freq: str = 'D'):
+    """
+    An actuals series and CV folds that overrun its end. With a fold `freq`
+    other than daily the overlapping slices differ in length, which is the
+    case that used to fall back to per-date indexing.
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2024-01-01', periods=length, freq='D')
+    actual = TimeSeries.from_times_and_values(dates, rng.normal(50, 5, length))
+    stride = max(1, length // folds)
+    forecasts = []
+    for i in range(folds):
+        start = dates[0] + pd.Timedelta(days=i * stride + stride // 2)
+        fold_dates = pd.date_range(start, periods=length // 2, freq=freq)
+        forecasts.append(TimeSeries.from_times_and_values(fold_dates, rng.normal(50, 5, len(fold_dates))))
+    return actual, forecasts
+
+
+def per_fold_ms(fn, actual, forecasts):
+    start = time.perf_counter()
+    for forecast in forecasts:
+        fn(actual, forecast)
+    return (time.perf_counter() - start) / len(forecasts) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, nargs='+', default=[365, 2000])
+    parser.add_argument('--folds', type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'length':>8} {'fold freq':>10} {'legacy ms/fold':>15} {'join ms/fold':>13} {'plot ms':>9}")
+    for length in args.length:
+        for freq in ('D', '12h'):
+            actual, forecasts = make_folds(length, args.folds, freq)
+            legacy = per_fold_ms(legacy_align, actual, forecasts)
+            joined = per_fold_ms(align_residuals, actual, forecasts)
+            start = time.perf_counter()
+            plot_residuals(actual, [('bench', forecasts)])
+            plot_ms = (time.perf_counter() - start) * 1000
+            print(f"{length:>8} {freq:>10} {legacy:>15.2f} {joined:>13.3f} {plot_ms:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
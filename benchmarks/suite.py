@@ -0,0 +1,345 @@
+# cap_poc/benchmarks/suite.py
+#
+# Benchmark suite for the forecasting pipeline: ingestion, each model's
+# fit/predict, CV backtests and their scoring, the full fit_and_forecast run
+# (also in long history mode on minute data), ensembling, residual plots and
+# forecast figure serialization, over synthetic CPU-like series of several
+# lengths.
+#
+# Every (case, length) runs in its own worker process, so its peak RSS is
+# not inflated by the cases before it. Each run appends one JSON line to the
+# history file, tagged with the git commit, and `compare` diffs two runs:
+#
+#   python -m benchmarks.suite run --lengths 1000 10000 100000 1000000
+#   python -m benchmarks.suite run --cases ingest fit_theta --repeat 5
+#   python -m benchmarks.suite compare                  # last two runs
+#   python -m benchmarks.suite compare --base abc1234   # latest run of a commit vs the last run
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from plotly.utils import PlotlyJSONEncoder
+
+from utils.telemetry import peak_rss
+from .synthetic import cpu_frame, cpu_series, upload_contents
+
+DEFAULT_LENGTHS = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.jsonl')
+
+# Hourly data: the daily cycle is 24 steps
+MODEL_PARAMS = {'exponentialsmoothing': {'seasonal_periods': 24}}
+
+
+def _fit_case(model_name):
+    def setup(length, horizon):
+        from models.forecast import _fit_predict
+        series = cpu_series(length)
+        return lambda: _fit_predict(model_name, series, horizon, MODEL_PARAMS.get(model_name))
+    return setup
+
+
+def _cv_refit_case(model_name):
+    def setup(length, horizon):
+        from models.backtest import run_backtest
+        series = cpu_series(length)
+        return lambda: run_backtest(model_name, series, horizon, params=MODEL_PARAMS.get(model_name),
+                                    executor='serial')
+    return setup
+
+
+def _cv_fast_case(model_name):
+    def setup(length, horizon):
+        from models.backtest import backtest_schedule, window_bounds
+        from models.fast_backtest import fast_backtest
+        from models.model_factory import get_model
+        series = cpu_series(length)
+        params = MODEL_PARAMS.get(model_name)
+        start, stride = backtest_schedule(length, horizon)
+        bounds = window_bounds(length, start, stride, get_model(model_name, params).min_train_series_length)
+        return lambda: fast_backtest(model_name, series, bounds, horizon, params)
+    return setup
+
+
+def _cv_metrics(length, horizon):
+    from models.backtest import backtest_schedule, window_bounds
+    from models.metrics import score_windows
+    truth = cpu_series(length)
+    start, stride = backtest_schedule(length, horizon)
+    bounds = window_bounds(length, start, stride)
+    windows = [_members(truth[end:end + horizon], 1)[0] for _, end in bounds]
+    return lambda: score_windows(truth, windows, bounds)
+
+
+def _ingest(length, horizon):
+    from utils.data_loader import parse_csv_contents
+    contents = upload_contents(cpu_frame(length))
+    return lambda: parse_csv_contents(contents)
+
+
+def _pipeline(length, horizon):
+    from models.forecast import Forecast
+    df = cpu_frame(length)
+    forecast = Forecast(['theta', 'exponentialsmoothing'], ensemble=True, executor='serial',
+                        model_params=MODEL_PARAMS)
+    return lambda: forecast.fit_and_forecast(df, horizon)
+
+
+def _pipeline_long(length, horizon):
+    from models.forecast import Forecast
+    # `length` 15-minute steps (96 a day) of minute data, trained on the last four weeks
+    df = cpu_frame(15 * length, freq='min')
+    forecast = Forecast(['theta', 'exponentialsmoothing'], ensemble=True, executor='serial',
+                        model_params={'exponentialsmoothing': {'seasonal_periods': 96}},
+                        resample='15min', max_lookback=28 * 96, dtype='float32')
+    return lambda: forecast.fit_and_forecast(df, horizon)
+
+
+def _members(truth, count=4):
+    """Member forecasts of `truth`: the actuals plus a different error per member."""
+    rng = np.random.default_rng(1)
+    return [truth.with_values(truth.values() + rng.normal(0, 2 + i, (len(truth), 1))) for i in range(count)]
+
+
+def _ensemble(length, horizon):
+    from models.ensemble import score_ensemble
+    truth = cpu_series(length)
+    members = _members(truth)
+    weights = np.array([1.0, 0.8, 0.6, 0.4])
+    return lambda: score_ensemble(members, truth, 'inverse_error', weights)
+
+
+def _ensemble_cv(length, horizon):
+    from models.backtest import backtest_schedule
+    from models.ensemble import score_ensemble
+    truth = cpu_series(length)
+    start, stride = backtest_schedule(length, horizon)
+    ends = range(start, length - horizon + 1, stride)
+    members = [[member[end:end + horizon] for end in ends] for member in _members(truth)]
+    return lambda: score_ensemble(members, truth)
+
+
+def _residuals(length, horizon):
+    from utils.visuals import max_points_for_width, plot_residuals
+    truth = cpu_series(length)
+    forecast = _members(truth, 1)[0]
+    max_points = max_points_for_width(1200)
+
+    def run():
+        graph = plot_residuals(truth, [('Theta', forecast)], max_points)
+        return json.dumps(graph, cls=PlotlyJSONEncoder)
+    return run
+
+
+def _figures(length, horizon):
+    from utils.visuals import max_points_for_width, plot_combined_forecasts
+    truth = cpu_series(length)
+    names = ['arima', 'theta', 'exponentialsmoothing']
+    val_forecasts = list(zip(names, _members(truth, len(names))))
+    future_start = truth.end_time() + truth.freq
+    future = [(name, cpu_series(horizon, seed=i, start=future_start)) for i, name in enumerate(names)]
+    max_points = max_points_for_width(1200)
+
+    def run():
+        figures = plot_combined_forecasts(truth, val_forecasts, future, max_points)
+        return json.dumps(figures, cls=PlotlyJSONEncoder)
+    return run
+
+
+# name -> (setup(length, horizon) returning the timed callable, longest series it runs on)
+CASES = {
+    'ingest': (_ingest, 1_000_000),
+    'fit_arima': (_fit_case('arima'), 10_000),
+    'fit_prophet': (_fit_case('prophet'), 100_000),
+    'fit_exponentialsmoothing': (_fit_case('exponentialsmoothing'), 100_000),
+    'fit_theta': (_fit_case('theta'), 100_000),
+    'cv_refit_theta': (_cv_refit_case('theta'), 100_000),
+    'cv_fast_theta': (_cv_fast_case('theta'), 100_000),
+    'cv_fast_exponentialsmoothing': (_cv_fast_case('exponentialsmoothing'), 100_000),
+    'cv_metrics': (_cv_metrics, 1_000_000),
+    'pipeline': (_pipeline, 100_000),
+    'pipeline_long': (_pipeline_long, 100_000),
+    'ensemble': (_ensemble, 1_000_000),
+    'ensemble_cv': (_ensemble_cv, 1_000_000),
+    'residuals': (_residuals, 1_000_000),
+    'figures': (_figures, 1_000_000),
+}
+
+
+def run_case(name: str, length: int, horizon: int, repeat: int, budget: float) -> dict:
+    """
+    Set up and time one case. Runs inside a fresh worker process.
+
+    The case runs `repeat` times, or fewer once `budget` seconds have been
+    spent, but at least once.
+
+    Returns:
+        Dict with the case, length, per-run seconds, their min and median, and
+        the peak RSS after setup and after the timed runs, in MB
+    """
+    warnings.filterwarnings('ignore')
+    setup, _ = CASES[name]
+    run = setup(length, horizon)
+    setup_rss = peak_rss() / 2**20
+
+    seconds = []
+    spent_start = time.perf_counter()
+    while len(seconds) < repeat and (not seconds or time.perf_counter() - spent_start < budget):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    return {
+        'case': name,
+        'length': length,
+        'seconds': seconds,
+        'min': min(seconds),
+        'median': statistics.median(seconds),
+        'setup_rss_mb': setup_rss,
+        'peak_rss_mb': peak_rss() / 2**20,
+    }
+
+
+def _git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit, bool(dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_suite(cases, lengths, horizon=24, repeat=3, budget=30.0):
+    """
+    Run every case on every length it supports, each in its own process.
+
+    Returns:
+        The history record: commit, machine, settings and one result per run
+    """
+    commit, dirty = _git_commit()
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'horizon': horizon,
+        'results': [],
+    }
+
+    print(f"{'case':>30} {'length':>9} {'min s':>9} {'median s':>9} {'peak MB':>9}")
+    for name in cases:
+        for length in lengths:
+            if length > CASES[name][1]:
+                continue
+            try:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    result = pool.submit(run_case, name, length, horizon, repeat, budget).result()
+            except Exception as e:
+                result = {'case': name, 'length': length, 'error': f"{type(e).__name__}: {e}"}
+                print(f"{name:>30} {length:>9} {result['error']}")
+            else:
+                print(f"{name:>30} {length:>9} {result['min']:>9.4f} {result['median']:>9.4f} "
+                      f"{result['peak_rss_mb']:>9.1f}")
+            record['results'].append(result)
+    return record
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _select(history, ref, default):
+    """The run at position `ref` (e.g. -2), or the latest run of commit `ref`."""
+    if ref is None:
+        return history[default]
+    try:
+        return history[int(ref)]
+    except ValueError:
+        matches = [run for run in history if run['commit'] and run['commit'].startswith(ref)]
+        if not matches:
+            raise SystemExit(f"No run of commit {ref} in the history")
+        return matches[-1]
+
+
+def compare(history, base=None, head=None, threshold=0.10) -> int:
+    """
+    Print the change in min time and peak RSS of every case two runs share.
+
+    Returns:
+        Number of cases whose min time grew by more than `threshold`
+    """
+    if len(history) < 2 and (base is None or head is None):
+        raise SystemExit("Need at least two runs in the history to compare")
+    base_run, head_run = _select(history, base, -2), _select(history, head, -1)
+    print(f"base {base_run['commit']} ({base_run['timestamp']})  head {head_run['commit']} ({head_run['timestamp']})")
+
+    base_results = {(r['case'], r['length']): r for r in base_run['results'] if 'error' not in r}
+    regressions = 0
+    print(f"{'case':>30} {'length':>9} {'base s':>9} {'head s':>9} {'ratio':>7} {'base MB':>8} {'head MB':>8}")
+    for result in head_run['results']:
+        key = (result['case'], result['length'])
+        if 'error' in result or key not in base_results:
+            continue
+        before = base_results[key]
+        ratio = result['min'] / before['min'] if before['min'] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'slower'
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print(f"{key[0]:>30} {key[1]:>9} {before['min']:>9.4f} {result['min']:>9.4f} {ratio:>7.2f} "
+              f"{before['peak_rss_mb']:>8.1f} {result['peak_rss_mb']:>8.1f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the benchmarks and append the results to the history")
+    run_parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    run_parser.add_argument('--lengths', type=int, nargs='+', default=DEFAULT_LENGTHS)
+    run_parser.add_argument('--horizon', type=int, default=24)
+    run_parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case")
+    run_parser.add_argument('--budget', type=float, default=30.0,
+                            help="Seconds after which a case stops repeating")
+    run_parser.add_argument('--history', default=DEFAULT_HISTORY)
+    run_parser.add_argument('--no-save', action='store_true', help="Do not append to the history")
+
+    compare_parser = commands.add_parser('compare', help="Diff two runs from the history")
+    compare_parser.add_argument('--base', help="Run index (e.g. -2) or commit prefix; default the second to last run")
+    compare_parser.add_argument('--head', help="Run index or commit prefix; default the last run")
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help="Relative change in min time reported as slower/faster")
+    compare_parser.add_argument('--history', default=DEFAULT_HISTORY)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        record = run_suite(args.cases, args.lengths, args.horizon, args.repeat, args.budget)
+        if not args.no_save:
+            with open(args.history, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+            print(f"Appended to {args.history}")
+        return 0
+    return 1 if compare(load_history(args.history), args.base, args.head, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# cap_poc/benchmarks/synthetic.py
+#
+# Synthetic CPU utilisation series for the benchmarks: daily and weekly
+# cycles, a slowly drifting baseline, noise and short load spikes, clipped to
+# 0-100 like a real utilisation metric.
+
+import base64
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+
+
+def cpu_frame(length: int, freq: str = 'h', seed: int = 0, start: str = '2000-01-01') -> pd.DataFrame:
+    """
+    A CPU-like series as the upload parser returns it.
+
+    Args:
+        length: Number of points
+        freq: Pandas frequency of the timestamps
+        seed: Random seed, so every run benchmarks the same data
+        start: First timestamp
+
+    Returns:
+        DataFrame with 'date' and 'value' columns
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=length, freq=freq)
+    days = ((dates - dates[0]) / pd.Timedelta(days=1)).to_numpy()
+    values = (
+        40
+        + 15 * np.sin(2 * np.pi * days)
+        + 5 * np.sin(2 * np.pi * days / 7)
+        + np.cumsum(rng.normal(0, 0.02, length))
+        + rng.normal(0, 4, length)
+    )
+    spikes = rng.random(length) < 0.002
+    values[spikes] += rng.uniform(20, 40, spikes.sum())
+    return pd.DataFrame({'date': dates, 'value': np.clip(values, 0, 100)})
+
+
+def cpu_series(length: int, freq: str = 'h', seed: int = 0, start: str = '2000-01-01') -> TimeSeries:
+    """cpu_frame as a darts TimeSeries."""
+    return TimeSeries.from_dataframe(cpu_frame(length, freq, seed, start), time_col='date', value_cols='value')
+
+
+def upload_contents(df: pd.DataFrame) -> str:
+    """The data URL dcc.Upload hands to parse_csv_contents for `df` saved as CSV."""
+    encoded = base64.b64encode(df.to_csv(index=False).encode('utf-8')).decode('ascii')
+    return f"data:text/csv;base64,{encoded}"
@@ -1,6 +1,16 @@
+import logging
+import os
+
 from dash import Dash
+from flask import Response
 from app.layout import layout
 from app.callbacks import register_callbacks
+from models.cache import default_cache
+from models.job_queue import default_queue
+from utils.telemetry import default_telemetry
+
+logging.basicConfig(level=os.environ.get('FORECAST_LOG_LEVEL', 'WARNING'),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 
 app = Dash(__name__)
 app.title = "CPU Utilization Forecasting"
@@ -8,5 +18,13 @@ app.layout = layout
 
 register_callbacks(app)
 
+
+@app.server.route('/metrics')
+def metrics():
+    # Forecast cache counters and pipeline span durations for Prometheus scraping
+    default_queue().collect_metrics()
+    body = default_cache().render_metrics() + default_telemetry().render_metrics()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
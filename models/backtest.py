@@ -0,0 +1,95 @@
+# cap_poc/models/backtest.py
+
+from utils.telemetry import span
+from .executor import run_jobs
+from .model_factory import get_model
+from .shared_series import as_timeseries
+
+TARGET_WINDOWS = 30
+
+
+def backtest_schedule(series_length: int, n_days: int, target_windows: int = TARGET_WINDOWS):
+    """
+    Pick the first forecast index and stride so that roughly `target_windows`
+    backtest windows cover the end of the series.
+
+    Returns:
+        Tuple (start, stride)
+    """
+    stride = max(1, (series_length - n_days) // (target_windows - 1))
+    start = max(0, series_length - n_days - stride * (target_windows - 1))
+    return start, stride
+
+
+def window_bounds(series_length: int, start: int, stride: int,
+                  min_train_length: int = 1, window_type: str = 'expanding', max_train_length: int = None):
+    """
+    Compute the training slice of every backtest window.
+
+    Forecasts start right after each training slice, on the same grid darts'
+    historical_forecasts uses with overlap_end=True: every `stride` points from
+    `start`, skipping windows shorter than the model's minimum training length.
+
+    Args:
+        series_length: Number of points in the full series
+        start: Index of the first forecast point
+        stride: Distance between consecutive forecast points
+        min_train_length: Minimum number of points the model can be fitted on
+        window_type: 'expanding' trains on everything before the forecast point,
+            'sliding' keeps the training length of the first window
+        max_train_length: Cap on every window's training length (None for no cap)
+
+    Returns:
+        List of (train_start, train_end) index pairs
+    """
+    ends = [i for i in range(start, series_length + 1, stride) if i >= min_train_length]
+    if window_type == 'sliding' and ends:
+        train_length = ends[0]
+    else:
+        train_length = None
+    if max_train_length is not None:
+        train_length = min(train_length or max_train_length, max_train_length)
+    if train_length is None:
+        return [(0, end) for end in ends]
+    return [(max(0, end - train_length), end) for end in ends]
+
+
+def fit_window(model_name, series, train_start, train_end, n_days, params=None, last_points_only=True):
+    """Fit a fresh model on one window and forecast `n_days` past it. Runs inside a worker."""
+    with span('backtest_window', model_name, length=train_end - train_start, train_end=train_end):
+        model = get_model(model_name, params)
+        model.fit(as_timeseries(series[train_start:train_end]))
+        forecast = model.predict(n_days)
+    return forecast[-1:] if last_points_only else forecast
+
+
+def window_jobs(model_name, series, bounds, n_days, params=None, last_points_only=True):
+    """Build one executor job per backtest window, keyed by (model, 'window', i)."""
+    return [
+        ((model_name, 'window', i), fit_window,
+         (model_name, series, train_start, train_end, n_days, params, last_points_only))
+        for i, (train_start, train_end) in enumerate(bounds)
+    ]
+
+
+def collect_windows(outputs: dict, model_name, n_windows: int):
+    """Put the window forecasts of one model back together in window order."""
+    return [outputs[(model_name, 'window', i)] for i in range(n_windows)]
+
+
+def run_backtest(model_name, series, n_days, window_type='expanding', params=None,
+                 executor='process', max_workers=None, last_points_only=True):
+    """
+    Backtest a model over the standard window schedule with window fits spread
+    over a worker pool.
+
+    Returns:
+        List of forecast TimeSeries, one per window (the last point of each
+        forecast when `last_points_only`, matching darts' historical_forecasts)
+    """
+    start, stride = backtest_schedule(len(series), n_days)
+    min_train_length = get_model(model_name, params).min_train_series_length
+    bounds = window_bounds(len(series), start, stride, min_train_length, window_type)
+    jobs = window_jobs(model_name, series, bounds, n_days, params, last_points_only)
+    outputs = run_jobs(jobs, executor, max_workers)
+    return collect_windows(outputs, model_name, len(bounds))
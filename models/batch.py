@@ -0,0 +1,174 @@
+# cap_poc/models/batch.py
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, wait
+
+import pandas as pd
+
+from utils.data_loader import load_series_file
+from utils.telemetry import default_telemetry, peak_rss, reset_peak_rss
+from .executor import get_executor
+from .forecast import Forecast
+from .tuning import tune_models
+
+SERIES_FILE_EXTENSIONS = ('.csv', '.parquet')
+
+
+def iter_series(source):
+    """
+    Yield (series_id, DataFrame) pairs from a batch source.
+
+    Args:
+        source: A long-format DataFrame with `series_id`, `date` and `value`
+            columns, or a directory of CSV/Parquet files (one series per file,
+            named after the file)
+    """
+    if isinstance(source, pd.DataFrame):
+        df = source.rename(columns=lambda c: c.strip().lower())
+        if not {'series_id', 'date', 'value'}.issubset(df.columns):
+            raise ValueError("Batch frame must contain 'series_id', 'date' and 'value' columns.")
+        df['date'] = pd.to_datetime(df['date'])
+        for series_id, group in df.groupby('series_id', sort=False):
+            yield series_id, group[['date', 'value']].reset_index(drop=True)
+        return
+
+    for name in sorted(os.listdir(source)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() in SERIES_FILE_EXTENSIONS:
+            yield stem, load_series_file(os.path.join(source, name))
+
+
+def _forecast_series(series_id, df, models, n_days, ensemble, ensemble_method, model_params, fit_kwargs, store=None,
+                     forecast_options=None, tune=None, cache=None):
+    """Forecast one series. Runs inside a worker; failures are returned, not raised."""
+    start = time.perf_counter()
+    reset_peak_rss()
+    with default_telemetry().capture() as spans:
+        try:
+            if tune is not None:
+                # Trials run serially here, the pool already runs one series per worker
+                tuned = tune_models(df, models, n_days, series_id, model_params, executor='serial', cache=cache,
+                                    store=store, **tune)
+                model_params = {**(model_params or {}), **tuned}  # tuned params already include the fixed ones
+            forecast = Forecast(models, ensemble=ensemble, executor='serial', model_params=model_params,
+                                ensemble_method=ensemble_method, cache=cache, store=store, **(forecast_options or {}))
+            result = forecast.fit_and_forecast(df, n_days=n_days, series_id=series_id, **fit_kwargs)
+            result.pop('truth', None)  # the caller already has the input series
+            error = None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+    return {'series_id': series_id, 'result': result, 'error': error, 'seconds': time.perf_counter() - start,
+            'peak_rss': peak_rss(), 'spans': spans.rows()}
+
+
+class BatchForecaster:
+    """
+    Run the selected models over many series with a bounded worker pool.
+
+    Each series is an independent job, so one bad series only fails itself.
+    A worker that dies outright also fails the other series it was running
+    alongside, and the pool is replaced for the rest of the batch.
+    At most `max_pending` series are queued at once; reading the source pauses
+    until a worker frees up, which keeps memory flat for very large batches.
+    With a `store` (ForecastStore), every series' results are also written
+    there for the app to serve without refitting. `forecast_options` are
+    extra Forecast arguments, e.g. max_lookback, resample and dtype. With
+    `tune` (Tuner arguments, e.g. {'search': 'random', 'n_trials': 8}), each
+    series' models are tuned first and forecast with their best parameters.
+    With a `cache` (ForecastCache), fits and tuning trials are memoized across
+    runs, so re-running a batch only refits series whose data changed.
+    """
+
+    def __init__(self, models: list, n_days: int, ensemble: bool = False, model_params: dict = None,
+                 ensemble_method: str = 'mean', executor='process', max_workers: int = None, max_pending: int = None,
+                 store=None, forecast_options: dict = None, tune: dict = None, cache=None, **fit_kwargs):
+        self.models = models
+        self.n_days = n_days
+        self.ensemble = ensemble
+        self.ensemble_method = ensemble_method
+        self.model_params = model_params
+        self.executor = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.store = store
+        self.forecast_options = forecast_options
+        self.tune = tune
+        self.cache = cache
+        self.fit_kwargs = fit_kwargs
+        self.completed = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self.peak_rss = 0
+
+    def run(self, source):
+        """
+        Forecast every series in `source`, yielding results as they finish.
+
+        Yields:
+            Dicts with `series_id`, `result` (the fit_and_forecast output, or
+            None), `error` (None on success), `seconds` and `peak_rss` (bytes)
+        """
+        self.completed = self.failed = self.peak_rss = 0
+        start = time.perf_counter()
+
+        pool = get_executor(self.executor, self.max_workers)
+        try:
+            pending = {}
+            for series_id, df in iter_series(source):
+                while len(pending) >= self.max_pending:
+                    yield from self._wait(pending, start)
+
+                try:
+                    future = self._submit(pool, series_id, df)
+                except BrokenExecutor:
+                    # A worker died (e.g. killed for memory) and took the pool down with it. The
+                    # series in flight fail; the rest of the batch carries on in a fresh pool.
+                    while pending:
+                        yield from self._wait(pending, start)
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = get_executor(self.executor, self.max_workers)
+                    future = self._submit(pool, series_id, df)
+                pending[future] = series_id
+
+            while pending:
+                yield from self._wait(pending, start)
+        finally:
+            pool.shutdown()
+
+    def _submit(self, pool, series_id, df):
+        return pool.submit(_forecast_series, series_id, df, self.models, self.n_days, self.ensemble,
+                           self.ensemble_method, self.model_params, self.fit_kwargs, self.store,
+                           self.forecast_options, self.tune, self.cache)
+
+    def _wait(self, pending, start):
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield self._finish(future, pending.pop(future), start)
+
+    def _finish(self, future, series_id, start):
+        try:
+            outcome = future.result()
+        except Exception as e:  # the worker itself died
+            outcome = {'series_id': series_id, 'result': None, 'error': f"{type(e).__name__}: {e}", 'seconds': None,
+                       'peak_rss': None}
+        default_telemetry().merge(outcome.pop('spans', []))
+        self.completed += 1
+        self.peak_rss = max(self.peak_rss, outcome['peak_rss'] or 0)
+        if outcome['error'] is not None:
+            self.failed += 1
+        self.elapsed = time.perf_counter() - start
+        return outcome
+
+    @property
+    def series_per_second(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'seconds': self.elapsed,
+            'series_per_second': self.series_per_second,
+            'peak_rss': self.peak_rss,
+        }
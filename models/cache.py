@@ -0,0 +1,192 @@
+# cap_poc/models/cache.py
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get('FORECAST_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'forecast_cache'))
+DEFAULT_MAX_BYTES = int(os.environ.get('FORECAST_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+COUNTERS = ('hits', 'misses', 'writes', 'evictions')
+
+
+def series_fingerprint(ts) -> str:
+    """Hash the values and timestamps of a TimeSeries."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(ts.values(copy=False)).tobytes())
+    digest.update(np.ascontiguousarray(ts.time_index.values).view(np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def make_key(series_hash: str, model_name: str, params: dict = None, horizon: int = None, **settings) -> str:
+    """
+    Build a cache key from the data hash and everything that changes a fit.
+
+    Args:
+        series_hash: Result of series_fingerprint
+        model_name: Model name as accepted by get_model
+        params: Model constructor parameters
+        horizon: Forecast horizon
+        settings: Any other run settings (phase, CV options, ...)
+
+    Returns:
+        Hex digest usable as a file name
+    """
+    payload = {
+        'series': series_hash,
+        'model': model_name.lower(),
+        'params': params or {},
+        'horizon': horizon,
+        'settings': settings,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+class ForecastCache:
+    """
+    On-disk cache of fitted models and forecasts.
+
+    Entries are pickles named after their key. Reads refresh the file's mtime,
+    so eviction drops the least recently used entries once the cache grows past
+    `max_bytes` or `max_entries`.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # Picklable for worker processes; the lock is per process
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except Exception as e:
+            if not isinstance(e, OSError):
+                # Truncated, or written by other code or library versions: drop it and refit
+                logger.warning("Dropping unreadable cache entry %s: %s: %s", key, type(e).__name__, e)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store `value` under `key`, then evict down to the size limits."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self.writes += 1
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits its limits."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            count -= 1
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.remove(path)
+
+    def counts(self) -> dict:
+        """The hit, miss, write and eviction counters."""
+        with self._lock:
+            return {name: getattr(self, name) for name in COUNTERS}
+
+    def merge(self, counts: dict):
+        """Add counters recorded elsewhere, e.g. by a cache instance in a worker process."""
+        with self._lock:
+            for name in COUNTERS:
+                setattr(self, name, getattr(self, name) + counts.get(name, 0))
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+            }
+
+    def render_metrics(self) -> str:
+        """Counters in Prometheus text exposition format."""
+        stats = self.stats()
+        lines = []
+        for name, kind in (('hits', 'counter'), ('misses', 'counter'), ('writes', 'counter'),
+                           ('evictions', 'counter'), ('entries', 'gauge'), ('bytes', 'gauge')):
+            metric = f"forecast_cache_{name}" + ('_total' if kind == 'counter' else '')
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {stats[name]}")
+        return "\n".join(lines) + "\n"
+
+
+_default_cache = None
+
+
+def default_cache() -> ForecastCache:
+    """Process-wide cache shared by the app callbacks and the metrics endpoint."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ForecastCache()
+    return _default_cache
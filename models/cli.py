@@ -0,0 +1,183 @@
+# cap_poc/models/cli.py
+#
+# Headless forecast runner for cron jobs. Only needs darts and pandas; the
+# Dash/Plotly UI stack is never imported.
+#
+#   python -m models.cli data/host1.csv --models Theta ARIMA --horizon 30 --out results/
+#   python -m models.cli data/hosts/ --models Theta --horizon 7 --format csv --out results/
+#   python -m models.cli fleet.parquet --long --models Theta --horizon 7 --out results/
+#   python -m models.cli data/hosts/ --models Theta ARIMA --horizon 7 --store /srv/forecast_store
+#   python -m models.cli minutes.parquet --models Theta --horizon 96 --resample 15min --max-lookback 2880 --float32
+#   python -m models.cli data/hosts/ --models Theta ExponentialSmoothing --horizon 7 --tune --store /srv/forecast_store
+#   python -m models.cli data/hosts/ --models Theta ARIMA --horizon 7 --tune --cache /srv/forecast_cache
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import load_series_file
+from utils.telemetry import peak_rss
+from .batch import BatchForecaster
+from .cache import ForecastCache
+from .ensemble import ENSEMBLE_METHODS
+from .executor import EXECUTOR_KINDS
+from .forecast import Forecast
+from .forecast_store import ForecastStore
+from .tuning import tune_models
+
+
+def result_frames(series_id, result):
+    """
+    Flatten one fit_and_forecast result into (forecasts, metrics) DataFrames.
+    CV metrics (one value per window) are summarized by their mean. Models
+    pruned by --race have a metrics row with their status but no forecasts.
+    """
+    forecasts = pd.concat(
+        [
+            pd.DataFrame({
+                'series_id': series_id,
+                'model': name,
+                'date': forecast.time_index,
+                'value': forecast.values(copy=False).flatten(),
+            })
+            for name, forecast in result['forecasts']
+        ],
+        ignore_index=True,
+    )
+    metrics = pd.DataFrame([
+        {
+            'series_id': series_id,
+            'model': metric['model'],
+            'mape': _summarize(metric['mape']),
+            'rmse': _summarize(metric['rmse']),
+            'smape': _summarize(metric.get('smape')),
+            'mase': _summarize(metric.get('mase')),
+            'status': metric.get('status'),
+        }
+        for metric in result['metrics']
+    ])
+    return forecasts, metrics
+
+
+def _summarize(value):
+    if value is None:
+        return np.nan
+    if isinstance(value, (list, tuple)):
+        values = [v for v in value if v is not None]
+        return float(np.mean(values)) if values else np.nan
+    return float(value)
+
+
+def write_frame(df, path, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m models.cli', description="Run forecasts without the UI.")
+    parser.add_argument('input', help="CSV/Parquet file, or a directory with one file per series")
+    parser.add_argument('--long', action='store_true',
+                        help="Input file is long format with series_id, date and value columns")
+    parser.add_argument('--models', nargs='+', required=True, help="Model names, e.g. ARIMA Theta")
+    parser.add_argument('--horizon', type=int, default=30, help="Forecast horizon in steps")
+    parser.add_argument('--ensemble', action='store_true')
+    parser.add_argument('--ensemble-method', choices=ENSEMBLE_METHODS, default='mean',
+                        help="How --ensemble combines the models; 'inverse_error' weights them by 1/validation MAPE")
+    parser.add_argument('--cv', action='store_true', help="Score with cross-validated backtests")
+    parser.add_argument('--window-type', choices=('expanding', 'sliding'), default='expanding')
+    parser.add_argument('--cv-engine', choices=('refit', 'fast'), default='refit',
+                        help="'fast' backtests ExponentialSmoothing/Theta in batched NumPy recursions")
+    parser.add_argument('--race', action='store_true',
+                        help="With --cv, drop clearly losing models after a few backtest windows")
+    parser.add_argument('--max-lookback', type=int, default=None,
+                        help="Train on at most this many (resampled) points, also per CV window")
+    parser.add_argument('--resample', default=None,
+                        help="Aggregate each series to this pandas frequency first, e.g. 15min; "
+                             "--horizon then counts resampled steps")
+    parser.add_argument('--float32', action='store_true', help="Keep series values as float32 to halve their memory")
+    parser.add_argument('--tune', action='store_true',
+                        help="Search each model's parameters on every series first and forecast with the best; "
+                             "with --store they are kept for later runs and the app")
+    parser.add_argument('--search', choices=('grid', 'random'), default='grid', help="Search strategy for --tune")
+    parser.add_argument('--trials', type=int, default=None, help="Configurations per model for --search random")
+    parser.add_argument('--patience', type=int, default=None,
+                        help="Stop tuning a model after this many trials without improvement")
+    parser.add_argument('--executor', choices=EXECUTOR_KINDS, default='process')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--allow-partial', action='store_true',
+                        help="Exit 0 when some series failed but at least one succeeded (default: exit 1 on any failure)")
+    parser.add_argument('--format', choices=('parquet', 'csv'), default='parquet')
+    parser.add_argument('--out', default='.', help="Output directory")
+    parser.add_argument('--cache', default=None,
+                        help="Memoize fits and tuning trials in this directory, so repeated runs skip unchanged work")
+    parser.add_argument('--store', default=None,
+                        help="Also write the results to the forecast store in this directory, for the app to serve")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fit_kwargs = dict(cross_validate=args.cv, window_type=args.window_type, cv_engine=args.cv_engine,
+                      race=args.race)
+    store = ForecastStore(args.store) if args.store else None
+    cache = ForecastCache(args.cache) if args.cache else None
+    forecast_options = dict(max_lookback=args.max_lookback, resample=args.resample,
+                            dtype='float32' if args.float32 else 'float64')
+    tune = None
+    if args.tune:
+        tune = dict(search=args.search, n_trials=args.trials, patience=args.patience, cross_validate=args.cv,
+                    window_type=args.window_type, cv_engine=args.cv_engine, **forecast_options)
+
+    forecast_frames, metric_frames, failures = [], [], 0
+    if os.path.isdir(args.input) or args.long:
+        source = args.input
+        if args.long:
+            source = pd.read_parquet(args.input) if args.input.endswith('.parquet') else pd.read_csv(args.input)
+        runner = BatchForecaster(args.models, args.horizon, ensemble=args.ensemble,
+                                 ensemble_method=args.ensemble_method, executor=args.executor,
+                                 max_workers=args.workers, store=store, forecast_options=forecast_options,
+                                 tune=tune, cache=cache, **fit_kwargs)
+        for outcome in runner.run(source):
+            if outcome['error'] is not None:
+                failures += 1
+                print(f"{outcome['series_id']}: {outcome['error']}", file=sys.stderr)
+                continue
+            forecasts, metrics = result_frames(outcome['series_id'], outcome['result'])
+            forecast_frames.append(forecasts)
+            metric_frames.append(metrics)
+        stats = runner.stats()
+        print(f"{stats['completed']} series in {stats['seconds']:.1f}s "
+              f"({stats['series_per_second']:.2f} series/s, {stats['failed']} failed, "
+              f"peak RSS per series {stats['peak_rss'] / 2**20:.0f} MiB)")
+    else:
+        series_id = os.path.splitext(os.path.basename(args.input))[0]
+        df = load_series_file(args.input)
+        model_params = None
+        if tune is not None:
+            model_params = tune_models(df, args.models, args.horizon, series_id, executor=args.executor,
+                                       max_workers=args.workers, cache=cache, store=store, **tune)
+            for name, params in model_params.items():
+                print(f"{series_id}: tuned {name} {params}")
+        forecast = Forecast(args.models, ensemble=args.ensemble, ensemble_method=args.ensemble_method,
+                            executor=args.executor, max_workers=args.workers, cache=cache, store=store,
+                            model_params=model_params, **forecast_options)
+        forecasts, metrics = result_frames(series_id, forecast.fit_and_forecast(df, n_days=args.horizon,
+                                                                                series_id=series_id, **fit_kwargs))
+        print(f"{series_id}: peak RSS {peak_rss() / 2**20:.0f} MiB")
+        forecast_frames.append(forecasts)
+        metric_frames.append(metrics)
+
+    os.makedirs(args.out, exist_ok=True)
+    if forecast_frames:
+        write_frame(pd.concat(forecast_frames, ignore_index=True), os.path.join(args.out, f"forecasts.{args.format}"), args.format)
+        write_frame(pd.concat(metric_frames, ignore_index=True), os.path.join(args.out, f"metrics.{args.format}"), args.format)
+    return 1 if failures and not (args.allow_partial and forecast_frames) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
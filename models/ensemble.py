@@ -1,8 +1,160 @@
 # cap_poc/models/ensemble.py
 
+import numpy as np
 from darts import TimeSeries
 
-def ensemble_forecasts(forecasts: list[TimeSeries]) -> TimeSeries:
-    if not forecasts:
+from .metrics import metric_row, naive_scale, score_arrays, window_arrays
+
+ENSEMBLE_METHODS = ('mean', 'median', 'inverse_error')
+
+
+def inverse_error_weights(errors: list) -> np.ndarray:
+    """
+    Member weights proportional to 1 / error, summing to one.
+
+    Args:
+        errors: One validation error per member (e.g. its MAPE); a list of
+            per-window errors is averaged, and None or non-finite values give
+            the member no weight
+
+    Returns:
+        Array of weights, equal weights if no member has a usable error
+    """
+    means = []
+    for error in errors:
+        if isinstance(error, (list, tuple)):
+            error = [e for e in error if e is not None]
+            error = np.mean(error) if error else None
+        means.append(np.nan if error is None else float(error))
+    means = np.array(means)
+
+    usable = np.isfinite(means)
+    if not usable.any():
+        return np.full(len(means), 1.0 / len(means))
+    weights = np.zeros(len(means))
+    weights[usable] = 1.0 / np.maximum(means[usable], 1e-12)
+    return weights / weights.sum()
+
+
+def combine(stacked: np.ndarray, method: str = 'mean', weights=None) -> np.ndarray:
+    """
+    Collapse the member axis (axis 0) of a stack of member forecasts.
+
+    Args:
+        stacked: Array of shape (members, ...)
+        method: 'mean', 'median' or 'inverse_error'
+        weights: One weight per member for 'inverse_error'; renormalized here
+
+    Returns:
+        Array of the stack's shape without its first axis
+    """
+    if method == 'mean':
+        return stacked.mean(axis=0)
+    if method == 'median':
+        return np.median(stacked, axis=0)
+    if method == 'inverse_error':
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.sum() <= 0:
+            return stacked.mean(axis=0)
+        return np.tensordot(weights / weights.sum(), stacked, axes=1)
+    raise ValueError(f"Unknown ensemble method '{method}', expected one of {ENSEMBLE_METHODS}")
+
+
+def _common_windows(members: list):
+    """Start times of the windows every member has, and one {start_time: forecast} dict per member."""
+    by_start = [{f.start_time(): f for f in windows if f is not None and len(f) > 0} for windows in members]
+    starts = sorted(set.intersection(*(set(windows) for windows in by_start)))
+    if not starts:
+        raise ValueError("Ensemble members share no backtest windows.")
+    return starts, by_start
+
+
+def stack_forecasts(members: list) -> tuple[np.ndarray, list]:
+    """
+    Stack member forecasts into one array.
+
+    Args:
+        members: One TimeSeries per member, all on the same time index, or one
+            list of backtest window forecasts per member
+
+    Returns:
+        (stacked, templates): an array of shape (members, windows, time, components),
+        with a single window for plain forecasts, and one member's forecast per
+        window to carry the combined values
+    """
+    if isinstance(members[0], TimeSeries):
+        first = members[0]
+        if any(len(f) != len(first) or f.start_time() != first.start_time() for f in members[1:]):
+            raise ValueError("Ensemble members must cover the same time steps.")
+        return np.stack([f.values(copy=False) for f in members])[:, None], [first]
+
+    starts, by_start = _common_windows(members)
+    stacked = np.stack([[windows[s].values(copy=False) for s in starts] for windows in by_start])
+    return stacked, [by_start[0][s] for s in starts]
+
+
+def ensemble_forecasts(members: list, method: str = 'mean', weights=None):
+    """
+    Combine member forecasts.
+
+    Args:
+        members: One TimeSeries per member, or one list of window forecasts per
+            member (only windows every member has are combined)
+        method: 'mean', 'median' or 'inverse_error'
+        weights: One weight per member for 'inverse_error'
+
+    Returns:
+        A TimeSeries, or a list of window TimeSeries for list members
+    """
+    if not members:
         raise ValueError("No forecasts to ensemble.")
-    return sum(forecasts) / len(forecasts)
\ No newline at end of file
+    stacked, templates = stack_forecasts(members)
+    combined = [t.with_values(v) for t, v in zip(templates, combine(stacked, method, weights))]
+    return combined[0] if isinstance(members[0], TimeSeries) else combined
+
+
+def score_ensemble(members: list, truth: TimeSeries, method: str = 'mean', weights=None, bounds: list = None):
+    """
+    Combine member forecasts and score the result against `truth` in one pass
+    over the stacked values.
+
+    Args:
+        members: As for ensemble_forecasts
+        truth: Observed series covering the forecasts; steps it does not cover
+            are left out of the scores
+        method: 'mean', 'median' or 'inverse_error'
+        weights: One weight per member for 'inverse_error'
+        bounds: (train_start, train_end) offsets of the members' training data,
+            shaped like `members` (one pair per member, or one list of pairs per
+            member), for the MASE scale; each ensemble window is scaled like the
+            first member's. None assumes everything before the forecast
+
+    Returns:
+        (ensemble, metrics): the ensemble as ensemble_forecasts returns it, and a
+        dict with the models/metrics.py METRICS, one value per window for list
+        members (windows `truth` does not cover are left out)
+    """
+    if not members:
+        raise ValueError("No forecasts to ensemble.")
+    stacked, templates = stack_forecasts(members)
+    combined = combine(stacked, method, weights)  # (windows, time, components)
+
+    # Truth values at every forecast step, NaN where the series ends first
+    actual, _, starts = window_arrays(truth, templates)
+    if bounds is None:
+        window_bounds = [(0, max(start, 0)) for start in starts]
+    elif isinstance(members[0], TimeSeries):
+        window_bounds = [bounds[0]]
+    else:
+        # The templates are the first member's windows
+        by_start = {f.start_time(): b for f, b in zip(members[0], bounds[0]) if f is not None and len(f) > 0}
+        window_bounds = [by_start[t.start_time()] for t in templates]
+    scale = naive_scale(truth.values(copy=False), window_bounds)
+    scores = metric_row(None, score_arrays(actual, combined, scale),
+                        per_window=not isinstance(members[0], TimeSeries))
+    del scores['model']
+
+    ensemble = [t.with_values(v) for t, v in zip(templates, combined)]
+    if isinstance(members[0], TimeSeries):
+        return ensemble[0], scores
+    return ensemble, scores
@@ -0,0 +1,135 @@
+# cap_poc/models/executor.py
+
+import os
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from utils.telemetry import default_telemetry
+
+EXECUTOR_KINDS = ('process', 'thread', 'serial')
+
+
+class SerialExecutor(Executor):
+    """Runs every submitted job inline, in the calling thread."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def _exit_with_parent(parent_pid: int, interval: float = 1.0):
+    """
+    Pool worker initializer: exit once the process that created the pool is
+    gone. A parent killed outright (e.g. a queue worker taken by the OOM killer)
+    never shuts its pool down, and its workers would otherwise wait forever.
+    """
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(interval)
+        os._exit(1)
+
+    threading.Thread(target=watch, name='exit-with-parent', daemon=True).start()
+
+
+def get_executor(kind: str = 'process', max_workers: int = None) -> Executor:
+    """
+    Build an executor by name.
+
+    Args:
+        kind: One of 'process', 'thread' or 'serial'
+        max_workers: Worker count for pooled executors (defaults to the CPU count)
+
+    Returns:
+        A concurrent.futures Executor
+    """
+    kind = kind.lower()
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_exit_with_parent,
+                                   initargs=(os.getpid(),))
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if kind == 'serial':
+        return SerialExecutor()
+    raise ValueError(f"Unsupported executor: {kind}")
+
+
+def run_jobs(jobs: list, executor='process', max_workers: int = None, on_done=None) -> dict:
+    """
+    Fan out a list of jobs and gather their results in submission order.
+
+    Args:
+        jobs: List of (key, fn, args) tuples; fn must be picklable for process pools
+        executor: Executor kind (see EXECUTOR_KINDS) or an existing Executor instance
+        max_workers: Worker count when a new pool is created
+        on_done: Optional callback(key, done, total) invoked as each job finishes.
+            If it raises, jobs that have not started yet are cancelled and the
+            exception propagates.
+
+    Returns:
+        Dict mapping each job key to its result, ordered like `jobs`
+    """
+    results = {}
+    with closing(iter_jobs(jobs, executor, max_workers)) as completed:
+        for key, result in completed:
+            results[key] = result
+            if on_done is not None:
+                on_done(key, len(results), len(jobs))
+    return {key: results[key] for key, _, _ in jobs}
+
+
+def iter_jobs(jobs: list, executor='process', max_workers: int = None):
+    """
+    Fan out a list of jobs and yield (key, result) pairs as they finish.
+
+    Closing the generator early cancels the jobs that have not started yet.
+    Arguments are the same as for run_jobs.
+    """
+    if not jobs:
+        return
+
+    if isinstance(executor, Executor):
+        yield from _completed(executor, jobs)
+        return
+
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+    with get_executor(executor, max_workers) as pool:
+        yield from _completed(pool, jobs)
+
+
+def _traced(fn, args):
+    """Run one job in a worker process and return its result with the spans it recorded."""
+    with default_telemetry().capture() as stats:
+        result = fn(*args)
+    return result, stats.rows()
+
+
+def _completed(pool: Executor, jobs: list):
+    if isinstance(pool, SerialExecutor):
+        # Run one at a time so progress and cancellation apply between jobs
+        for key, fn, args in jobs:
+            yield key, fn(*args)
+        return
+
+    if isinstance(pool, ProcessPoolExecutor):
+        # Spans recorded in the workers come back with the results
+        futures = {pool.submit(_traced, fn, args): key for key, fn, args in jobs}
+    else:
+        futures = {pool.submit(fn, *args): key for key, fn, args in jobs}
+    try:
+        for future in as_completed(futures):
+            result = future.result()
+            if isinstance(pool, ProcessPoolExecutor):
+                result, rows = result
+                default_telemetry().merge(rows)
+            yield futures[future], result
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
@@ -0,0 +1,213 @@
+# cap_poc/models/fast_backtest.py
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+from darts.utils.utils import ModelMode, SeasonalityMode
+
+from utils.telemetry import span
+from .model_factory import get_model
+from .shared_series import as_timeseries
+
+# Re-estimate the parameters once the training window has grown by this fraction
+REFIT_GROWTH = 0.25
+
+
+def _anchor_segments(ends: np.ndarray, refit_growth: float):
+    """Split window ends into (first, last) runs that share the fit made on their first window."""
+    segments = []
+    first = 0
+    for i in range(1, len(ends) + 1):
+        if i == len(ends) or ends[i] > ends[first] * (1 + refit_growth):
+            segments.append((first, i))
+            first = i
+    return segments
+
+
+def _periodic(values: np.ndarray, period: int, length: int) -> np.ndarray:
+    """Repeat the last `period` entries of `values` until it is `length` long."""
+    extra = np.arange(max(0, length - len(values)))
+    return np.concatenate([values, values[len(values) - period + extra % period]])
+
+
+def _es_windows(model, values: np.ndarray, ends: np.ndarray, n_days: int) -> np.ndarray:
+    """
+    Forecasts of a fitted darts ExponentialSmoothing from every origin in `ends`.
+
+    One pass of the smoothing recursions over the series, with the anchor's
+    parameters and initial states, yields the filtered states at every origin;
+    the forecasts are then built from those states for all origins at once,
+    following statsmodels' Holt-Winters forecast equations.
+    """
+    import statsmodels.tsa.holtwinters as hw
+    params = model.model.params
+    trend = model.trend.value if model.trend is not None else None
+    seasonal = model.seasonal.value if model.seasonal is not None else None
+    m = model.seasonal_periods if seasonal else 1
+
+    constructor_kwargs = {'initialization_method': 'known', 'initial_level': params['initial_level']}
+    if trend:
+        constructor_kwargs['initial_trend'] = params['initial_trend']
+    if seasonal:
+        constructor_kwargs['initial_seasonal'] = params['initial_seasons']
+    fit_kwargs = {
+        key: params[key]
+        for key in ('smoothing_level', 'smoothing_trend', 'smoothing_seasonal', 'damping_trend')
+        if params.get(key) is not None and not np.isnan(params[key])
+    }
+    results = hw.ExponentialSmoothing(
+        values[:ends[-1]],
+        trend=trend,
+        damped_trend=model.damped,
+        seasonal=seasonal,
+        seasonal_periods=model.seasonal_periods if seasonal else None,
+        **constructor_kwargs,
+    ).fit(optimized=False, **fit_kwargs)
+
+    # States after the last observation of each window, one row per origin
+    level = np.asarray(results.level)[ends - 1][:, None]
+    h = np.arange(1, n_days + 1)
+
+    if trend:
+        slope = np.asarray(results.trend)[ends - 1][:, None]
+        phi_h = np.cumsum(params['damping_trend'] ** h) if model.damped else h
+        if model.trend is ModelMode.MULTIPLICATIVE:
+            forecast = level * slope ** phi_h
+        else:
+            forecast = level + slope * phi_h
+    else:
+        forecast = np.repeat(level, n_days, axis=1)
+
+    if seasonal:
+        seasons = np.concatenate([params['initial_seasons'], np.asarray(results.season)])
+        t = ends[:, None]
+        idx = t + h - 1
+        # statsmodels cycles the seasonal states of the last season past the first m - 1 steps
+        wrapped = idx - (t + m - 1)
+        idx = np.where(wrapped >= 0, t - 1 + np.maximum(wrapped, 0) % m, idx)
+        if model.seasonal is SeasonalityMode.MULTIPLICATIVE:
+            forecast = forecast * seasons[idx]
+        else:
+            forecast = forecast + seasons[idx]
+
+    return forecast
+
+
+def _theta_windows(model, values: np.ndarray, ends: np.ndarray, n_days: int) -> np.ndarray:
+    """
+    Forecasts of a fitted darts Theta from every origin in `ends`.
+
+    The smoothing level and seasonal profile of the anchor fit are held fixed;
+    the SES levels of all origins come from one linear filter pass and the
+    drift slopes from running sums, so no per-window fit is needed.
+    """
+    from scipy.signal import lfilter
+    alpha, theta = model.alpha, model.theta
+    length = ends[-1] + n_days
+    series = values[:ends[-1]]
+
+    seasonal = None
+    if model.is_seasonal:
+        seasonal = _periodic(model.seasonality.values(copy=False).ravel(), model.season_period, length)
+        if model.season_mode is SeasonalityMode.MULTIPLICATIVE:
+            series = series / seasonal[:len(series)]
+        else:
+            series = series - seasonal[:len(series)]
+
+    # SES level after each observation, starting from the anchor's initial level
+    initial_level = model.model.params['initial_level']
+    levels, _ = lfilter([alpha], [1.0, alpha - 1.0], series, zi=[(1.0 - alpha) * initial_level])
+
+    # Least-squares slope of each window's prefix against 0..t-1
+    t = ends.astype(np.float64)
+    sum_y = np.cumsum(series)[ends - 1]
+    sum_xy = np.cumsum(np.arange(len(series)) * series)[ends - 1]
+    sum_x = t * (t - 1) / 2
+    sum_xx = (t - 1) * t * (2 * t - 1) / 6
+    slope = (t * sum_xy - sum_x * sum_y) / (t * sum_xx - sum_x ** 2)
+    coef = slope * (theta - 1.0) / theta
+
+    steps = np.arange(n_days)
+    drift = coef[:, None] * (steps + ((1 - (1 - alpha) ** t) / alpha)[:, None])
+    forecast = levels[ends - 1][:, None] + drift
+
+    if seasonal is not None:
+        season = seasonal[ends[:, None] - model.season_period + steps % model.season_period]
+        if model.season_mode is SeasonalityMode.MULTIPLICATIVE:
+            forecast = forecast * season
+        else:
+            forecast = forecast + season
+
+    return forecast
+
+
+FAST_BACKTESTS = {
+    "exponentialsmoothing": _es_windows,
+    "theta": _theta_windows,
+}
+
+
+def supports_fast_backtest(name: str, window_type: str = 'expanding', params: dict = None) -> bool:
+    """
+    Whether `fast_backtest` can evaluate this model. Only expanding windows share
+    the prefix the batched recursions rely on; Box-Cox transformed models are not handled.
+    """
+    if name.lower() not in FAST_BACKTESTS or window_type != 'expanding':
+        return False
+    return not (params or {}).get('kwargs', {}).get('use_boxcox')
+
+
+def fast_backtest(model_name, series: TimeSeries, bounds, n_days: int, params: dict = None,
+                  refit_growth: float = REFIT_GROWTH, last_points_only: bool = True):
+    """
+    Evaluate all expanding backtest windows of ExponentialSmoothing or Theta in
+    batched NumPy computations instead of one full fit per window.
+
+    The model is fitted with darts on anchor windows only: the first window, then
+    the first window whose training length exceeds the last anchor's by more than
+    `refit_growth`. The windows in between reuse the anchor's parameters with their
+    states filtered forward over the extra points. Short early windows therefore
+    get re-estimated often and long late ones rarely. `refit_growth=0` fits every
+    window and reproduces the regular backtest exactly. Runs inside a worker.
+
+    Args:
+        model_name: 'exponentialsmoothing' or 'theta'
+        series: The full series
+        bounds: (train_start, train_end) pairs from window_bounds, expanding windows
+        n_days: Forecast horizon
+        params: Optional model constructor params
+        refit_growth: Relative growth of the training window that triggers a new fit
+        last_points_only: Keep only the last point of each forecast, like run_backtest
+
+    Returns:
+        List of forecast TimeSeries, one per window, in the same shape run_backtest returns
+    """
+    if not bounds:
+        return []
+    series = as_timeseries(series)
+    ends = np.array([train_end for _, train_end in bounds])
+    values = series.values(copy=False).ravel()
+    window_forecasts = FAST_BACKTESTS[model_name.lower()]
+
+    forecasts = np.empty((len(ends), n_days))
+    for first, last in _anchor_segments(ends, refit_growth):
+        segment = ends[first:last]
+        with span('backtest_anchor', model_name, length=int(segment[0]), windows=len(segment)):
+            model = get_model(model_name, params)
+            model.fit(series[:segment[0]])
+            forecasts[first:last] = window_forecasts(model, values, segment, n_days)
+
+    # Time index covering every forecast, including those running past the end of the series
+    future = pd.date_range(series.end_time(), periods=n_days + 1, freq=series.freq)[1:]
+    time_index = series.time_index.append(future)
+
+    if last_points_only:
+        return [
+            TimeSeries.from_times_and_values(time_index[end + n_days - 1:end + n_days], row[-1:],
+                                             columns=series.components)
+            for end, row in zip(ends, forecasts)
+        ]
+    return [
+        TimeSeries.from_times_and_values(time_index[end:end + n_days], row, columns=series.components)
+        for end, row in zip(ends, forecasts)
+    ]
@@ -1,16 +1,80 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager
+
 from darts import TimeSeries
-from darts.metrics import mape, rmse
+from utils.telemetry import default_telemetry, span
 from .model_factory import AVAILABLE_MODELS, get_model
-from .ensemble import ensemble_forecasts
+from .ensemble import ENSEMBLE_METHODS, ensemble_forecasts, inverse_error_weights, score_ensemble
+from .executor import iter_jobs
+from .backtest import backtest_schedule, window_bounds, window_jobs, collect_windows
+from .fast_backtest import supports_fast_backtest, fast_backtest
+from .warm_start import supports_warm_refit, warm_refit
+from .cache import series_fingerprint, make_key
+from .metrics import metric_row, score_windows
+from .racing import race_ends, prune
+from .shared_series import share_series, as_timeseries
 from darts.utils.utils import ModelMode
 
+logger = logging.getLogger(__name__)
+
+
+def split_series(df, resample: str = None, dtype: str = None):
+    """
+    The series in `df` and the index where its validation part starts (the last 20%).
+
+    Args:
+        df: Frame with `date` and `value` columns
+        resample: Pandas frequency to aggregate to by mean, e.g. '15min'; empty
+            periods are interpolated
+        dtype: Value dtype of the series, e.g. 'float32' (None keeps the frame's)
+    """
+    if resample:
+        df = df.resample(resample, on='date')['value'].mean().interpolate(method='time').reset_index()
+    if dtype is not None and df['value'].dtype != dtype:
+        df = df.assign(value=df['value'].astype(dtype))
+    ts = TimeSeries.from_dataframe(df, time_col='date', value_cols='value')
+    return ts, int(0.8 * len(ts))
+
 
+def _fit_predict(model_name, series, n, params=None):
+    """Fit a fresh model on `series` and predict `n` steps. Runs inside a worker."""
+    series = as_timeseries(series)
+    model = get_model(model_name, params)
+    with span('fit', model_name, length=len(series)):
+        model.fit(series)
+    with span('predict', model_name, horizon=n):
+        return model, model.predict(n)
 
 
 class Forecast:
-    def __init__(self, models: list, ensemble: bool = False):
+    def __init__(self, models: list, ensemble: bool = False, executor='process', max_workers: int = None,
+                 warm_refit: bool = True, model_params: dict = None, cache=None, progress=None,
+                 shared_memory: bool = True, ensemble_method: str = 'mean', store=None,
+                 max_lookback: int = None, resample: str = None, dtype: str = 'float64', use_tuned: bool = True):
         self.models = models
         self.ensemble = ensemble
+        if ensemble_method not in ENSEMBLE_METHODS:
+            raise ValueError(f"Unknown ensemble method '{ensemble_method}', expected one of {ENSEMBLE_METHODS}")
+        self.ensemble_method = ensemble_method  # 'mean', 'median' or 'inverse_error' (weights from validation MAPE)
+        self.executor = executor  # 'process', 'thread', 'serial' or an Executor instance
+        self.max_workers = max_workers
+        self.warm_refit = warm_refit  # extend validation fits to the full series where the model allows it
+        self.model_params = {name.lower(): params for name, params in (model_params or {}).items()}
+        self.cache = cache  # optional ForecastCache shared across runs
+        self.progress = progress  # optional callback(event: dict) for per-job progress
+        self.shared_memory = shared_memory  # hand process workers the series through shared memory
+        self.store = store  # optional ForecastStore finished results are written to and served from
+        # Parameters tuned for the series (models/tuning.py) are read from the store for models
+        # without explicit `model_params`
+        self.use_tuned = use_tuned
+        self.tuned_params = {}
+        # Long histories: train on at most `max_lookback` points (also per CV window), aggregate
+        # to the `resample` frequency first (horizons then count resampled steps), and keep the
+        # values as `dtype`, e.g. 'float32' to halve every copy of the series
+        self.max_lookback = max_lookback
+        self.resample = resample
+        self.dtype = dtype
         self.model_instances = {}
 
 
@@ -29,158 +93,525 @@ class Forecast:
 
     
 
+    def _warm_refits(self, model_name, cross_validate):
+        # CV runs keep no single validation fit to extend, so they always refit. Neither do
+        # capped lookbacks: extending the validation fit would train past the cap.
+        return (self.warm_refit and not cross_validate and self.max_lookback is None
+                and supports_warm_refit(model_name))
+
+    def _lookback(self, end):
+        """First index of the training slice ending at `end`."""
+        return 0 if self.max_lookback is None else max(0, end - self.max_lookback)
+
+    @contextmanager
+    def _worker_series(self, ts):
+        """
+        The series to put in job arguments: a shared memory handle when the jobs
+        run in worker processes, so the values are copied once per run instead
+        of pickled into every job, and `ts` itself otherwise.
+        """
+        in_processes = self.executor == 'process' or isinstance(self.executor, ProcessPoolExecutor)
+        if not (self.shared_memory and in_processes):
+            yield ts
+            return
+        with share_series(ts) as shared:
+            yield shared
+
+    def _params(self, model_name):
+        name = model_name.lower()
+        return self.model_params.get(name, self.tuned_params.get(name))
+
+    def _load_tuned(self, series_id):
+        """Look up the tuned parameters of every requested model for `series_id`."""
+        self.tuned_params = {}
+        if self.store is None or series_id is None or not self.use_tuned:
+            return
+        for model_name in self.models:
+            if model_name.lower() in AVAILABLE_MODELS and model_name.lower() not in self.model_params:
+                params = self.store.tuned_params(series_id, model_name)
+                if params is not None:
+                    self.tuned_params[model_name.lower()] = params
+
+    def _cache_get(self, keys, model_name, phase, cached):
+        if self.cache is None:
+            return False
+        value = self.cache.get(keys[(model_name, phase)])
+        if value is None:
+            return False
+        cached[(model_name, phase)] = value
+        return True
+
+    def _report_planned(self, jobs):
+        if self.progress is not None:
+            planned = {}
+            for key, _, _ in jobs:
+                planned[key[0]] = planned.get(key[0], 0) + 1
+            self.progress({'event': 'planned', 'jobs': planned, 'total': len(jobs)})
+
+    def _report_done(self, key, done, total):
+        if self.progress is not None:
+            self.progress({
+                'event': 'job_done',
+                'model': key[0],
+                'phase': key[1],
+                'window': key[2] if len(key) > 2 else None,
+                'done': done,
+                'total': total,
+            })
+
+    def _cache_put(self, keys, model_name, phase, value):
+        if self.cache is not None:
+            self.cache.put(keys[(model_name, phase)], value)
+
     def fit_and_forecast(
         self,
         df,
         n_days: int,
         cross_validate: bool = False,
         window_type: str = 'expanding',  # or 'sliding'
-        stride: int = 1):
-        
-        ts = TimeSeries.from_dataframe(df, time_col='date', value_cols='value')
-        # Split: 80% train, 20% validation
-        split_idx = int(0.8 * len(ts))
-        train, val = ts[:split_idx], ts[split_idx:]
+        stride: int = 1,
+        cv_engine: str = 'refit',  # or 'fast' for batched ExponentialSmoothing/Theta backtests
+        race: bool = False,  # prune clearly losing models after a few backtest windows
+        series_id: str = None):  # ID to store the results under when the Forecast has a store
 
-        val_forecasts = []
-        results = []
+        with default_telemetry().profiled('fit_and_forecast'):
+            results = self.collect_results(
+                self.iter_forecasts(df, n_days, cross_validate, window_type, stride, cv_engine, race, series_id))
 
-        # Validation phase
-        for model_name in self.models:
-            if model_name.lower() == "ensemble":
-                continue  # Skip 'ensemble' as standalone model
-            model = get_model(model_name)
+        if logger.isEnabledFor(logging.DEBUG):
+            for name, f in results['val_forecasts']:
+                if isinstance(f, TimeSeries):
+                    logger.debug("Validation forecast %s: %d points, %s - %s", name, len(f), f.start_time(), f.end_time())
+                else:
+                    logger.debug("Validation forecast %s: %d windows", name, len(f))
+            for name, f in results['forecasts']:
+                logger.debug("Future forecast %s: %d points, %s - %s", name, len(f), f.start_time(), f.end_time())
 
-            if cross_validate:
-                # Generate backtest forecasts with more verbose output
-                print(f"Running historical forecasts for {model_name}...")
-               # Target: 30 windows
-                target_windows = 30
-                stride = max(1, (len(ts) - n_days) // (target_windows - 1))
-                
-
-                start = len(ts) - n_days - stride * (target_windows - 1)
-                start = max(0, start)
-
-                print(f"Start index: {start}, Expected windows: {(len(ts) - start - n_days) // stride + 1}")
-                backtest_forecast = model.historical_forecasts(
-                    ts,
-                    start=start,  # Start from 80% of the data
-                    forecast_horizon=n_days,
-                    stride= stride,
-                    retrain=True,
-                    verbose=True,
-                    overlap_end=True,
-                    
-                )
-                
-                print(f"Generated {len(backtest_forecast)} backtest forecasts for {model_name}")
-               
-                # Find the forecast that most closely aligns with the validation period
-                # For visualization, get the forecast that starts closest to val.start_time()
-                best_forecast = None
-                min_diff = float('inf')
-                
-                for f in backtest_forecast:
-                    if f is not None and len(f) > 0:
-                        time_diff = abs((f.start_time() - val.start_time()).total_seconds())
-                        if time_diff < min_diff:
-                            min_diff = time_diff
-                            best_forecast = f
-                
-                # Calculate metrics with all backtest forecasts
-                # Align actuals with forecasted series
-                actuals = []
-                valid_forecasts = []
-                
-                for f in backtest_forecast:
-                    if f is not None and len(f) > 0:
-                        actual_slice = ts.slice(f.start_time(), f.end_time())
-                        if len(actual_slice) > 0:
-                            actuals.append(actual_slice)
-                            print("Appending valid_forecasts ", f.start_time(), f.end_time())
-                            valid_forecasts.append(f)
-
-                if actuals and valid_forecasts:
-                    score = {
-                        'model': f"{model_name} (CV)",
-                        'mape': mape(actuals, valid_forecasts),
-                        'rmse': rmse(actuals, valid_forecasts),
-                    }
-                    
-                    # Store the best forecast for visualization
-                    if valid_forecasts is not None:
-                        #print(f"Adding CV forecast for {model_name}: {valid_forecasts.start_time()} to {valid_forecasts.end_time()}")
-                        val_forecasts.append((f"{model_name} (CV)", valid_forecasts))
-                    
-                    
-                    results.append(score)
+        return results
+
+    def collect_results(self, items) -> dict:
+        """
+        Assemble per-model items from iter_forecasts into the fit_and_forecast result.
+
+        Models are listed in the order they were requested whatever order they
+        finished in, with the ensemble last. A partial list of items gives the
+        results known so far. Models pruned by a race have a metrics row but
+        no future forecast.
+        """
+        order = {name: i for i, name in enumerate(self.models)}
+        items = sorted(items, key=lambda item: order.get(item['model'], len(order)))
+
+        results = {'metrics': [], 'val_forecasts': [], 'val_truth': None, 'forecasts': [], 'truth': None}
+        for item in items:
+            results['metrics'].append(item['metrics'])
+            if item['val_forecast'] is not None:
+                results['val_forecasts'].append(item['val_forecast'])
+            if item['forecast'] is not None:
+                results['forecasts'].append(item['forecast'])
+            results['val_truth'] = item['val_truth']
+            results['truth'] = item['truth']  # Pass the full time series for better plots
+        return results
+
+    def iter_forecasts(
+        self,
+        df,
+        n_days: int,
+        cross_validate: bool = False,
+        window_type: str = 'expanding',  # or 'sliding'
+        stride: int = 1,
+        cv_engine: str = 'refit',  # or 'fast' for batched ExponentialSmoothing/Theta backtests
+        race: bool = False,  # prune clearly losing models after a few backtest windows
+        series_id: str = None):  # ID to store the results under when the Forecast has a store
+        """
+        Run the forecast and yield each model's results as soon as all of its fits are done.
+
+        With `race` on a cross-validated run, every model is first scored on a few
+        backtest windows spread over the schedule, clearly worse models are dropped,
+        and the rest race on more windows (see models/racing.py). Only the survivors
+        get their full backtest and future fit; pruned models are yielded with a
+        'status' in their metrics row and forecast None. Plain validation runs
+        ignore `race`, as they fit each model only once before the future fit.
+
+        Yields:
+            Dicts with the model name, its metrics row, its (label, validation forecast)
+            pair, its (name, future forecast) pair, and the validation and full series.
+            The ensemble, when requested, comes last under the name 'Ensemble'.
+        """
+        self._load_tuned(series_id)
+        items = self._iter_items(df, n_days, cross_validate, window_type, stride, cv_engine, race)
+        if self.store is None or series_id is None:
+            yield from items
+            return
+
+        settings = dict(cross_validate=cross_validate, window_type=window_type, stride=stride,
+                        cv_engine=cv_engine, race=race)
+        members, fingerprint = [], None
+        with closing(items):
+            for item in items:
+                if fingerprint is None:
+                    fingerprint = series_fingerprint(item['truth'])
+                model_name = item['model']
+                if model_name == 'Ensemble':
+                    model_settings = self._store_settings(model_name, settings, members)
                 else:
-                    results.append({
-                        'model': f"{model_name} (CV)",
-                        'mape': None,
-                        'rmse': None,
-                    })
+                    model_settings = self._store_settings(model_name, settings)
+                    if item['forecast'] is not None:
+                        members.append(model_name)
+                # The series is the caller's input; stored_results puts it back on load
+                stored = {key: value for key, value in item.items() if key not in ('truth', 'val_truth')}
+                self.store.put(series_id, model_name, n_days, str(item['truth'].end_time()), model_settings,
+                               stored, fingerprint)
+                yield item
 
-            else:
-                # Fit on training and validate
-                model.fit(train)
-                val_forecast = model.predict(len(val))
-                val_forecasts.append((model_name, val_forecast))
+    def _iter_items(self, df, n_days, cross_validate, window_type, stride, cv_engine, race):
+        with span('split', length=len(df)):
+            # Split: 80% train, 20% validation
+            ts, split_idx = split_series(df, self.resample, self.dtype)
+            val = ts[split_idx:]
+
+        model_names = [m for m in self.models if m.lower() != "ensemble"]  # Skip 'ensemble' as standalone model
+
+        if cross_validate:
+            # Target: 30 windows, each refit independently in the worker pool
+            start, stride = backtest_schedule(len(ts), n_days)
+            logger.debug("Start index: %d, expected windows: %d", start, (len(ts) - start - n_days) // stride + 1)
+
+        # Batched backtests where the model supports them, one fit per window otherwise.
+        # Capped lookbacks turn expanding windows into sliding ones, which they do not support.
+        fast_cv = {
+            model_name: cv_engine == 'fast' and self.max_lookback is None
+            and supports_fast_backtest(model_name, window_type, self._params(model_name))
+            for model_name in model_names
+        }
+
+        # Cache keys cover the data, the model config and every setting that changes a phase's output
+        keys = {}
+        if self.cache is not None:
+            series_hash = series_fingerprint(ts)
+            lookback = {'max_lookback': self.max_lookback} if self.max_lookback is not None else {}
+            for model_name in model_names:
+                params = self._params(model_name)
+                engine = {'cv_engine': 'fast'} if fast_cv[model_name] else {}
+                keys[(model_name, 'cv')] = make_key(series_hash, model_name, params, n_days,
+                                                    phase='cv', window_type=window_type, **engine, **lookback)
+                keys[(model_name, 'validation')] = make_key(series_hash, model_name, params, n_days,
+                                                            phase='validation', **lookback)
+                keys[(model_name, 'future')] = make_key(series_hash, model_name, params, n_days,
+                                                        phase='future',
+                                                        warm_refit=self._warm_refits(model_name, cross_validate),
+                                                        **lookback)
+        cached = {}
+
+        with self._worker_series(ts) as source:
+            train = source[self._lookback(split_idx):split_idx]
+            bounds = {}
+            if cross_validate:
+                for model_name in model_names:
+                    # Cached backtests still need their windows' bounds to be scored
+                    self._cache_get(keys, model_name, 'cv', cached)
+                    min_train_length = get_model(model_name, self._params(model_name)).min_train_series_length
+                    bounds[model_name] = window_bounds(len(ts), start, stride, min_train_length, window_type,
+                                                       self.max_lookback)
+
+            outputs = dict(cached)
+            pruned, rounds = {}, 0
+            if race and cross_validate and len(model_names) > 1:
+                pruned, rounds = self._race(model_names, source, ts, n_days, bounds, fast_cv, outputs)
+                for model_name, (round_no, ends, _) in pruned.items():
+                    yield self._pruned_item(model_name, round_no, ends, bounds, outputs, ts, val)
+                model_names = [m for m in model_names if m not in pruned]
+
+            # Fan out every (model, phase) fit so the models train concurrently
+            jobs = []
+            window_counts = {}
+            for model_name in model_names:
+                params = self._params(model_name)
+                if cross_validate:
+                    if (model_name, 'cv') not in outputs:
+                        logger.debug("Running historical forecasts for %s", model_name)
+                        if fast_cv[model_name]:
+                            jobs.append(((model_name, 'cv'), fast_backtest,
+                                         (model_name, source, bounds[model_name], n_days, params)))
+                        else:
+                            window_counts[model_name] = len(bounds[model_name])
+                            # Windows already fitted while racing are reused
+                            jobs.extend(job for job in window_jobs(model_name, source, bounds[model_name], n_days, params)
+                                        if job[0] not in outputs)
+                elif not self._cache_get(keys, model_name, 'validation', cached):
+                    jobs.append(((model_name, 'validation'), _fit_predict, (model_name, train, len(val), params)))
+                if self._cache_get(keys, model_name, 'future', cached):
+                    continue
+                if not self._warm_refits(model_name, cross_validate):
+                    jobs.append(((model_name, 'future'), _fit_predict,
+                                 (model_name, source[self._lookback(len(ts)):], n_days, params)))
+
+            outputs.update(cached)
+            pending = {model_name: 0 for model_name in model_names}
+            for key, _, _ in jobs:
+                pending[key[0]] += 1
+
+            def finish(model_name):
+                score, val_forecast, val_bounds = self._validation_result(
+                    model_name, outputs, cached, keys, ts, val, cross_validate, window_counts, bounds.get(model_name))
+                if rounds:
+                    score['status'] = f"kept after {rounds} race round{'s' if rounds > 1 else ''}"
 
-                metrics = {
+                if (model_name, 'future') in outputs:
+                    model, future_forecast = outputs[(model_name, 'future')]
+                else:
+                    # Carry the validation fit forward over the last 20% instead of refitting from zero
+                    with span('warm_refit', model_name, length=len(ts)):
+                        model = warm_refit(model_name, self.model_instances[model_name], ts)
+                    with span('predict', model_name, horizon=n_days):
+                        future_forecast = model.predict(n_days)
+                if (model_name, 'future') not in cached:
+                    self._cache_put(keys, model_name, 'future', (model, future_forecast))
+
+                return {
                     'model': model_name,
-                    'mape': mape(val, val_forecast),
-                    'rmse': rmse(val, val_forecast),
+                    'metrics': score,
+                    'val_forecast': val_forecast,
+                    'val_bounds': val_bounds,
+                    'forecast': (model_name, future_forecast),
+                    'val_truth': val,
+                    'truth': ts,
                 }
-                results.append(metrics)
-                self.model_instances[model_name] = model
-
-        # Ensemble on validation
-        if self.ensemble and len(val_forecasts) > 1:
-            val_series = [f for _, f in val_forecasts if isinstance(f, TimeSeries)]
-            ensemble_val = ensemble_forecasts(val_series)
-            ensemble_metrics = {
-                'model': 'Ensemble',
-                'mape': mape(val, ensemble_val),
-                'rmse': rmse(val, ensemble_val),
-            }
-            results.append(ensemble_metrics)
-            val_forecasts.append(('Ensemble', ensemble_val))
 
-        # Forecast future
-        forecasts = []
-        full_train = ts
+            finished = []
+            self._report_planned(jobs)
 
-        for model_name in self.models:
-            if model_name.lower() == "ensemble":
-                continue
-            model = get_model(model_name)
-            model.fit(full_train)
-            future_forecast = model.predict(n_days)
-            forecasts.append((model_name, future_forecast))
-
-        if self.ensemble and len(forecasts) > 1:
-            future_series = [f for _, f in forecasts]
-            ensemble_forecast = ensemble_forecasts(future_series)
-            forecasts.append(('Ensemble', ensemble_forecast))
-        
-        # Debug output
-        print("\nValidation forecasts:")
-        for name, f in val_forecasts:
-            print(f"→ {name}: {type(f)} | len: {len(f) if isinstance(f, TimeSeries) else 'N/A'}")
-            if isinstance(f, TimeSeries):
-                print(f"  Time range: {f.start_time()} - {f.end_time()}")
-        
-        print("\nFuture forecasts:")
-        for name, f in forecasts:
-            print(f"→ {name}: {type(f)} | len: {len(f)}")
-            print(f"  Time range: {f.start_time()} - {f.end_time()}")
-        
+            # Models served entirely from the cache are ready straight away
+            for model_name in model_names:
+                if pending[model_name] == 0:
+                    finished.append(finish(model_name))
+                    yield finished[-1]
+
+            with closing(iter_jobs(jobs, self.executor, self.max_workers)) as completed:
+                for done, (key, result) in enumerate(completed, start=1):
+                    outputs[key] = result
+                    self._report_done(key, done, len(jobs))
+                    pending[key[0]] -= 1
+                    if pending[key[0]] == 0:
+                        finished.append(finish(key[0]))
+                        yield finished[-1]
+
+        if self.ensemble and len(finished) > 1:
+            yield self._ensemble_item(finished, ts, val, cross_validate)
+
+    def _store_settings(self, model_name, settings, members=None):
+        """Everything besides series, model, horizon and data that a stored result depends on."""
+        if self.max_lookback is not None:
+            settings = {**settings, 'max_lookback': self.max_lookback}
+        if model_name == 'Ensemble':
+            return {**settings, 'members': sorted(m.lower() for m in members), 'method': self.ensemble_method}
+        return {**settings, 'params': self._params(model_name)}
+
+    def stored_results(self, df, n_days: int, series_id: str, cross_validate: bool = False,
+                       window_type: str = 'expanding', stride: int = 1, cv_engine: str = 'refit',
+                       race: bool = False):
+        """
+        The fit_and_forecast result of an earlier run with the same data and
+        settings, served from the store without fitting anything.
+
+        Returns:
+            The result dict, or None on a miss (no store, or any requested model
+            not stored for this exact series)
+        """
+        if self.store is None:
+            return None
+        self._load_tuned(series_id)
+        ts, split_idx = split_series(df, self.resample, self.dtype)
+        as_of, fingerprint = str(ts.end_time()), series_fingerprint(ts)
+        settings = dict(cross_validate=cross_validate, window_type=window_type, stride=stride,
+                        cv_engine=cv_engine, race=race)
+
+        items = []
+        for model_name in [m for m in self.models if m.lower() != "ensemble"]:
+            item = self.store.latest(series_id, model_name, n_days, self._store_settings(model_name, settings),
+                                     as_of, fingerprint)
+            if item is None:
+                return None
+            items.append(item)
+        members = [item['model'] for item in items if item['forecast'] is not None]
+        if self.ensemble and len(members) > 1:
+            item = self.store.latest(series_id, 'Ensemble', n_days,
+                                     self._store_settings('Ensemble', settings, members), as_of, fingerprint)
+            if item is None:
+                return None
+            items.append(item)
+
+        val = ts[split_idx:]
+        return self.collect_results([{**item, 'val_truth': val, 'truth': ts} for item in items])
+
+    def _race(self, model_names, source, ts, n_days, bounds, fast_cv, outputs):
+        """
+        Successive halving over the backtest windows: fit every model on the
+        windows of the first round, drop the clear losers, add windows for the
+        rest and repeat. Window fits are left in `outputs`, so the survivors only
+        fit the windows they have not seen yet.
+
+        Returns:
+            (pruned, rounds): pruned model name to (round, training ends scored,
+            mean error), and the number of rounds run
+        """
+        field, pruned, scored, rounds = list(model_names), {}, [], 0
+        for rounds, ends in enumerate(race_ends(bounds, len(ts), n_days), start=1):
+            ends = set(ends)
+            jobs = []
+            for model_name in field:
+                if (model_name, 'cv') in outputs:
+                    continue
+                params = self._params(model_name)
+                if fast_cv[model_name]:
+                    # A batched backtest covers every window for about the cost of one fit
+                    jobs.append(((model_name, 'cv'), fast_backtest,
+                                 (model_name, source, bounds[model_name], n_days, params)))
+                else:
+                    wanted = {i for i, (_, end) in enumerate(bounds[model_name]) if end in ends}
+                    jobs.extend(job for job in window_jobs(model_name, source, bounds[model_name], n_days, params)
+                                if job[0][2] in wanted)
+
+            with span('race_round', round=rounds, models=len(field), windows=len(ends)):
+                self._report_planned(jobs)
+                with closing(iter_jobs(jobs, self.executor, self.max_workers)) as completed:
+                    for done, (key, result) in enumerate(completed, start=1):
+                        outputs[key] = result
+                        self._report_done(key, done, len(jobs))
+
+            scored.extend(sorted(ends))
+            errors = {}
+            for model_name in field:
+                forecasts, train_bounds = self._raced_windows(model_name, scored, bounds, outputs)
+                errors[model_name] = score_windows(ts, forecasts, train_bounds)['overall']['mape']
+            dropped = prune(errors)
+            for model_name in dropped:
+                pruned[model_name] = (rounds, list(scored), errors[model_name])
+            field = [m for m in field if m not in dropped]
+            logger.info("Race round %d (%d windows): MAPE %s, pruned %s", rounds, len(scored),
+                        {m: round(e, 3) for m, e in errors.items()}, sorted(dropped) or "none")
+            if len(field) == 1:
+                break
+        return pruned, rounds
+
+    @staticmethod
+    def _raced_windows(model_name, ends, bounds, outputs):
+        """A model's forecasts for the backtest windows ending at `ends`, and those windows' bounds."""
+        ends = set(ends)
+        positions = [i for i, (_, end) in enumerate(bounds[model_name]) if end in ends]
+        if (model_name, 'cv') in outputs:
+            forecasts = [outputs[(model_name, 'cv')][i] for i in positions]
+        else:
+            forecasts = [outputs[(model_name, 'window', i)] for i in positions]
+        return forecasts, [bounds[model_name][i] for i in positions]
+
+    def _pruned_item(self, model_name, round_no, ends, bounds, outputs, ts, val):
+        """Result item for a model dropped by the race, scored on the windows it raced."""
+        forecasts, train_bounds = self._raced_windows(model_name, ends, bounds, outputs)
+        with span('metrics', model_name, windows=len(forecasts)):
+            scores = score_windows(ts, forecasts, train_bounds)
+        label = f"{model_name} (CV)"
+        score = metric_row(label, scores)
+        score['status'] = f"pruned after round {round_no} ({len(ends)} of {len(bounds[model_name])} windows)"
         return {
-            'metrics': results,
-            'val_forecasts': val_forecasts,
+            'model': model_name,
+            'metrics': score,
+            'val_forecast': (label, [f for f, covered in zip(forecasts, scores['covered']) if covered]),
+            'val_bounds': [b for b, covered in zip(train_bounds, scores['covered']) if covered],
+            'forecast': None,
             'val_truth': val,
-            'forecasts': forecasts,
-            'truth': ts  # Pass the full time series for better plots
-        }
\ No newline at end of file
+            'truth': ts,
+        }
+
+    def _ensemble_item(self, finished, ts, val, cross_validate):
+        """Combine the finished models' validation (or backtest) and future forecasts and score the ensemble."""
+        with span('ensemble', members=len(finished), method=self.ensemble_method):
+            label = 'Ensemble (CV)' if cross_validate else 'Ensemble'
+            weights = None
+            if self.ensemble_method == 'inverse_error':
+                weights = inverse_error_weights([item['metrics']['mape'] for item in finished])
+
+            scored = [i for i, item in enumerate(finished) if item['val_forecast'] is not None]
+            if scored:
+                members = [finished[i]['val_forecast'][1] for i in scored]
+                member_weights = None if weights is None else weights[scored]
+                # Scored against the whole series so MASE can scale by the same training data as the members
+                ensemble_val, scores = score_ensemble(members, ts, self.ensemble_method, member_weights,
+                                                      [finished[i]['val_bounds'] for i in scored])
+                val_forecast = (label, ensemble_val)
+            else:
+                scores, val_forecast = {'mape': None, 'rmse': None}, None
+
+            ensemble_forecast = ensemble_forecasts([item['forecast'][1] for item in finished],
+                                                   self.ensemble_method, weights)
+            return {
+                'model': 'Ensemble',
+                'metrics': {'model': label, **scores},
+                'val_forecast': val_forecast,
+                'forecast': ('Ensemble', ensemble_forecast),
+                'val_truth': val,
+                'truth': ts,
+            }
+
+    def _validation_result(self, model_name, outputs, cached, keys, ts, val, cross_validate, window_counts,
+                           train_bounds=None):
+        """
+        Metrics row, (label, forecast) pair and training bounds of the scored
+        forecasts (one pair, or one per backtest window) for one model's
+        validation or backtest fits.
+        """
+        if cross_validate:
+            # Generate backtest forecasts with more verbose output
+            if (model_name, 'cv') in outputs:
+                backtest_forecast = outputs[(model_name, 'cv')]
+            else:
+                backtest_forecast = collect_windows(outputs, model_name, window_counts[model_name])
+            if (model_name, 'cv') not in cached:
+                self._cache_put(keys, model_name, 'cv', backtest_forecast)
+
+            logger.debug("Generated %d backtest forecasts for %s", len(backtest_forecast), model_name)
+           
+            # Find the forecast that most closely aligns with the validation period
+            # For visualization, get the forecast that starts closest to val.start_time()
+            best_forecast = None
+            min_diff = float('inf')
+            
+            for f in backtest_forecast:
+                if f is not None and len(f) > 0:
+                    time_diff = abs((f.start_time() - val.start_time()).total_seconds())
+                    if time_diff < min_diff:
+                        min_diff = time_diff
+                        best_forecast = f
+            
+            # Score every window in one vectorized pass over the actuals
+            windows = [(f, b) for f, b in zip(backtest_forecast, train_bounds) if f is not None and len(f) > 0]
+            if windows:
+                forecasts = [f for f, _ in windows]
+                with span('metrics', model_name, windows=len(forecasts)):
+                    scores = score_windows(ts, forecasts, [b for _, b in windows])
+                if scores['covered'].any():
+                    covered = scores['covered']
+                    valid_forecasts = [f for f, c in zip(forecasts, covered) if c]
+                    valid_bounds = [b for (_, b), c in zip(windows, covered) if c]
+                    label = f"{model_name} (CV)"
+                    return metric_row(label, scores), (label, valid_forecasts), valid_bounds
+
+            return {
+                'model': f"{model_name} (CV)",
+                'mape': None,
+                'rmse': None,
+                'smape': None,
+                'mase': None,
+            }, None, None
+
+        # Fit on training and validate
+        model, val_forecast = outputs[(model_name, 'validation')]
+        if (model_name, 'validation') not in cached:
+            self._cache_put(keys, model_name, 'validation', (model, val_forecast))
+
+        split_idx = len(ts) - len(val)
+        val_bounds = (self._lookback(split_idx), split_idx)
+        with span('metrics', model_name, length=len(val)):
+            scores = score_windows(ts, [val_forecast], [val_bounds])
+        metrics = metric_row(model_name, scores, per_window=False)
+        self.model_instances[model_name] = model
+        return metrics, (model_name, val_forecast), val_bounds
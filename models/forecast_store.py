@@ -0,0 +1,171 @@
+# cap_poc/models/forecast_store.py
+
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+import uuid
+from urllib.parse import quote
+
+from .sqlite_util import connect, init_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.environ.get('FORECAST_STORE_DIR', os.path.join(tempfile.gettempdir(), 'forecast_store'))
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS forecasts (
+        id INTEGER PRIMARY KEY,
+        series_id TEXT NOT NULL,
+        model TEXT NOT NULL,
+        horizon INTEGER NOT NULL,
+        as_of TEXT NOT NULL,
+        settings TEXT NOT NULL,
+        fingerprint TEXT,
+        path TEXT NOT NULL,
+        created REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS forecasts_lookup ON forecasts (series_id, model, horizon, as_of)",
+    """
+    CREATE TABLE IF NOT EXISTS tuned_params (
+        id INTEGER PRIMARY KEY,
+        series_id TEXT NOT NULL,
+        model TEXT NOT NULL,
+        params TEXT NOT NULL,
+        metric TEXT,
+        score REAL,
+        trials INTEGER,
+        created REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS tuned_params_lookup ON tuned_params (series_id, model)",
+]
+
+
+class ForecastStore:
+    """
+    Persistent store of finished forecasts, for serving precomputed results.
+
+    Each entry is one model's result item from Forecast.iter_forecasts, pickled
+    under `<root>/<series_id>/<as_of date>/`, and indexed in SQLite on
+    (series_id, model, horizon, as_of), where `as_of` is the last timestamp of
+    the series the model was fitted on. `settings` holds everything else that
+    changes the result (CV options, model parameters, ensemble members) as
+    canonical JSON, and `fingerprint` the hash of the input series, so a lookup
+    only matches a run on the same data with the same configuration.
+
+    The store also keeps the best parameters found by models/tuning.py per
+    series and model, which Forecast runs for that series then use.
+
+    Args:
+        root: Directory for the index database and result files
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = root
+        self.db_path = os.path.join(root, 'forecasts.sqlite')
+        os.makedirs(root, exist_ok=True)
+        init_db(self.db_path, SCHEMA)
+
+    def put(self, series_id: str, model: str, horizon: int, as_of: str, settings: dict, item: dict,
+            fingerprint: str = None) -> str:
+        """
+        Store one model's result item and index it.
+
+        Returns:
+            Path of the written file
+        """
+        folder = os.path.join(self.root, quote(str(series_id), safe=''), as_of[:10])
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{model.lower()}-{horizon}-{uuid.uuid4().hex}.pkl")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        with connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO forecasts (series_id, model, horizon, as_of, settings, fingerprint, path, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(series_id), model.lower(), horizon, as_of, json.dumps(settings, sort_keys=True, default=repr),
+                 fingerprint, os.path.relpath(path, self.root), time.time()),
+            )
+        return path
+
+    def latest(self, series_id: str, model: str, horizon: int, settings: dict, as_of: str = None,
+               fingerprint: str = None):
+        """
+        The most recent stored item for a series and model.
+
+        Args:
+            as_of: Only match results fitted on data ending here; None takes the latest as_of
+            fingerprint: Only match results fitted on this exact series
+
+        Returns:
+            The stored item, or None if there is none (or its file is gone)
+        """
+        query = ("SELECT path FROM forecasts WHERE series_id = ? AND model = ? AND horizon = ? AND settings = ?")
+        args = [str(series_id), model.lower(), horizon, json.dumps(settings, sort_keys=True, default=repr)]
+        if as_of is not None:
+            query += " AND as_of = ?"
+            args.append(as_of)
+        if fingerprint is not None:
+            query += " AND fingerprint = ?"
+            args.append(fingerprint)
+        query += " ORDER BY as_of DESC, created DESC LIMIT 1"
+
+        with connect(self.db_path) as conn:
+            row = conn.execute(query, args).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(self.root, row['path'])
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except OSError:
+            return None
+        except Exception as e:
+            # Written by other code or library versions: drop it so the run recomputes and stores it again
+            logger.warning("Dropping unreadable stored forecast %s: %s: %s", row['path'], type(e).__name__, e)
+            with connect(self.db_path) as conn:
+                conn.execute("DELETE FROM forecasts WHERE path = ?", (row['path'],))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def put_params(self, series_id: str, model: str, params: dict, metric: str = None, score: float = None,
+                   trials: int = None):
+        """Record the tuned parameters of a model for a series; the latest record wins."""
+        with connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO tuned_params (series_id, model, params, metric, score, trials, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(series_id), model.lower(), json.dumps(params, sort_keys=True), metric, score, trials, time.time()),
+            )
+
+    def tuned_params(self, series_id: str, model: str):
+        """The latest tuned parameters of a model for a series, or None if it was never tuned."""
+        with connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT params FROM tuned_params WHERE series_id = ? AND model = ? ORDER BY created DESC LIMIT 1",
+                (str(series_id), model.lower()),
+            ).fetchone()
+        return None if row is None else json.loads(row['params'])
+
+
+_default_store = None
+
+
+def default_forecast_store() -> ForecastStore:
+    """Process-wide forecast store used by the app callbacks and the job queue."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ForecastStore()
+    return _default_store
@@ -0,0 +1,291 @@
+# cap_poc/models/job_queue.py
+
+import functools
+import json
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.telemetry import default_telemetry, peak_rss, reset_peak_rss
+from .cache import default_cache
+from .forecast import Forecast
+from .forecast_store import default_forecast_store
+from .sqlite_util import connect, init_db
+
+DEFAULT_JOB_DIR = os.environ.get('FORECAST_JOB_DIR', os.path.join(tempfile.gettempdir(), 'forecast_jobs'))
+DEFAULT_QUEUE_WORKERS = int(os.environ.get('FORECAST_QUEUE_WORKERS', 2))
+DEFAULT_INNER_EXECUTOR = os.environ.get('FORECAST_INNER_EXECUTOR', 'process')
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        params TEXT,
+        progress TEXT,
+        error TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        spans TEXT,
+        cache_counts TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL
+    )
+    """,
+]
+# Columns added after the first release, for databases created before them
+ADDED_COLUMNS = {'jobs': {'spans': 'TEXT', 'cache_counts': 'TEXT'}}
+
+
+def _update(db_path, job_id, **fields):
+    fields['updated'] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with connect(db_path) as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _cancel_requested(db_path, job_id) -> bool:
+    with connect(db_path) as conn:
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return bool(row and row['cancel_requested'])
+
+
+class _ProgressRecorder:
+    """Forecast progress callback that persists per-model counts and honours cancellation."""
+
+    def __init__(self, db_path, job_id):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.state = {'done': 0, 'total': 0, 'models': {}, 'ready': []}
+
+    def __call__(self, event):
+        if event['event'] == 'planned':
+            self.state['total'] = event['total']
+            self.state['models'] = {name: {'done': 0, 'total': count} for name, count in event['jobs'].items()}
+        elif event['event'] == 'job_done':
+            self.state['done'] = event['done']
+            self.state['models'][event['model']]['done'] += 1
+        elif event['event'] == 'model_ready':
+            self.state['ready'].append(event['model'])
+        elif event['event'] == 'finished':
+            self.state['peak_rss'] = event['peak_rss']
+        _update(self.db_path, self.job_id, progress=json.dumps(self.state))
+        if _cancel_requested(self.db_path, self.job_id):
+            raise JobCancelled(self.job_id)
+
+
+def _write_result(result_path, results):
+    tmp_path = f"{result_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, result_path)
+
+
+def _start(db_path, job_id) -> bool:
+    """Move a job from queued to running; False if it was cancelled in the meantime."""
+    with connect(db_path) as conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status = ? AND cancel_requested = 0",
+            (RUNNING, time.time(), job_id, QUEUED),
+        )
+        return cursor.rowcount == 1
+
+
+def _run_job(db_path, result_path, job_id, df, forecast_kwargs, fit_kwargs):
+    """
+    Run one forecast job. Runs inside a queue worker process. The spans and
+    cache counters the run records are stored with the job for
+    `collect_metrics` in the web process.
+    """
+    if not _start(db_path, job_id):
+        return
+
+    telemetry = default_telemetry()
+    cache = default_cache()
+    counts_before = cache.counts()
+    reset_peak_rss()  # the worker may have run bigger jobs before
+    with telemetry.capture() as spans, telemetry.profiled(f"job-{job_id}"):
+        try:
+            recorder = _ProgressRecorder(db_path, job_id)
+            forecast = Forecast(cache=cache, store=default_forecast_store(), progress=recorder,
+                                **forecast_kwargs)
+            items = []
+            for item in forecast.iter_forecasts(df, **fit_kwargs):
+                # Publish what is known so far so the UI can show each model as it lands
+                items.append(item)
+                _write_result(result_path, forecast.collect_results(items))
+                recorder({'event': 'model_ready', 'model': item['model']})
+            recorder({'event': 'finished', 'peak_rss': peak_rss()})
+            status, error = DONE, None
+        except JobCancelled:
+            status, error = CANCELLED, None
+        except Exception as e:
+            status, error = FAILED, f"{type(e).__name__}: {e}"
+    cache_counts = {name: count - counts_before[name] for name, count in cache.counts().items()}
+    _update(db_path, job_id, status=status, error=error, spans=json.dumps(spans.rows()),
+            cache_counts=json.dumps(cache_counts))
+
+
+def _fail_if_lost(db_path, job_id, future):
+    """
+    Done callback of a queued run: a future that raised means the run never got
+    to record its outcome, e.g. because its worker died, so the job is failed.
+    """
+    if future.cancelled() or future.exception() is None:
+        return
+    error = future.exception()
+    with connect(db_path) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ? AND status IN (?, ?)",
+            (FAILED, f"{type(error).__name__}: {error}", time.time(), job_id, QUEUED, RUNNING),
+        )
+
+
+class JobQueue:
+    """
+    Local queue for forecast runs.
+
+    Job state lives in a SQLite database so any web worker can poll or cancel a
+    job; the runs themselves execute in a process pool owned by the worker that
+    accepted them. Finished results are pickled next to the database.
+
+    Args:
+        root: Directory for the job database and result files
+        max_workers: Number of forecast runs executed concurrently
+        inner_executor: Executor each run uses for its own model fits
+        inner_workers: Worker count of that executor; defaults to an equal share
+            of the CPUs per concurrent run, so the runs together don't oversubscribe
+    """
+
+    def __init__(self, root: str = DEFAULT_JOB_DIR, max_workers: int = DEFAULT_QUEUE_WORKERS,
+                 inner_executor: str = DEFAULT_INNER_EXECUTOR, inner_workers: int = None):
+        self.root = root
+        self.db_path = os.path.join(root, 'jobs.sqlite')
+        self.max_workers = max_workers
+        self.inner_executor = inner_executor
+        self.inner_workers = inner_workers or max(1, (os.cpu_count() or 1) // max_workers)
+        self._pool = None
+        os.makedirs(root, exist_ok=True)
+        init_db(self.db_path, SCHEMA, ADDED_COLUMNS)
+
+    def _result_path(self, job_id):
+        return os.path.join(self.root, f"{job_id}.pkl")
+
+    def submit(self, df, models: list, n_days: int, ensemble: bool = False, ensemble_method: str = 'mean',
+               forecast_options: dict = None, **fit_kwargs) -> str:
+        """
+        Queue a forecast run and return its job ID. Runs given a `series_id`
+        are written to the default forecast store as their models finish.
+        `forecast_options` are extra Forecast arguments, e.g. max_lookback,
+        resample and dtype for long histories.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        params = {'models': models, 'n_days': n_days, 'ensemble': ensemble, 'ensemble_method': ensemble_method,
+                  **(forecast_options or {}), **fit_kwargs}
+        with connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), now, now),
+            )
+
+        forecast_kwargs = {'models': models, 'ensemble': ensemble, 'ensemble_method': ensemble_method,
+                           'executor': self.inner_executor, 'max_workers': self.inner_workers, **(forecast_options or {})}
+        args = (_run_job, self.db_path, self._result_path(job_id), job_id, df, forecast_kwargs,
+                {'n_days': n_days, **fit_kwargs})
+        try:
+            future = self._get_pool().submit(*args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) and took the pool down; start a new one
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            future = self._get_pool().submit(*args)
+        future.add_done_callback(functools.partial(_fail_if_lost, self.db_path, job_id))
+        return job_id
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Spawned, not forked: the web process has threads and SQLite handles a fork would copy
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def status(self, job_id: str) -> dict:
+        """Current state of a job: status, progress counts and error, or None if unknown."""
+        with connect(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'params': json.loads(row['params']),
+            'progress': json.loads(row['progress']) if row['progress'] else None,
+            'error': row['error'],
+            'created': row['created'],
+            'updated': row['updated'],
+        }
+
+    def cancel(self, job_id: str):
+        """Ask a job to stop; it is cancelled before it starts or after its current fit."""
+        with connect(self.db_path) as conn:
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated = ?, "
+                "status = CASE WHEN status = ? THEN ? ELSE status END WHERE id = ?",
+                (time.time(), QUEUED, CANCELLED, job_id),
+            )
+
+    def result(self, job_id: str):
+        """
+        The fit_and_forecast output of a job. While the job is running this holds
+        the models finished so far (listed in progress['ready']); None before the first.
+        """
+        if not os.path.exists(self._result_path(job_id)):
+            return None
+        with open(self._result_path(job_id), 'rb') as f:
+            return pickle.load(f)
+
+    def collect_metrics(self, telemetry=None, cache=None):
+        """
+        Move the spans and cache counters recorded by finished jobs into
+        `telemetry` and `cache` (the defaults if None), so the metrics endpoint
+        covers the queue workers. Each job's metrics are collected once.
+        """
+        telemetry = telemetry or default_telemetry()
+        cache = cache or default_cache()
+        with connect(self.db_path) as conn:
+            rows = conn.execute("SELECT id, spans, cache_counts FROM jobs WHERE spans IS NOT NULL").fetchall()
+            for row in rows:
+                telemetry.merge(json.loads(row['spans']))
+                if row['cache_counts']:
+                    cache.merge(json.loads(row['cache_counts']))
+            conn.executemany("UPDATE jobs SET spans = NULL, cache_counts = NULL WHERE id = ?",
+                             [(row['id'],) for row in rows])
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+_default_queue = None
+
+
+def default_queue() -> JobQueue:
+    """Process-wide queue used by the app callbacks."""
+    global _default_queue
+    if _default_queue is None:
+        _default_queue = JobQueue()
+    return _default_queue
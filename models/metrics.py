@@ -0,0 +1,132 @@
+# cap_poc/models/metrics.py
+#
+# Forecast scoring over many windows at once. Every forecast step is mapped to
+# an integer offset into the observed series, so the actuals of all windows
+# come from one fancy-indexing read instead of a TimeSeries slice per window,
+# and each metric is a single NumPy reduction over a (windows, steps,
+# components) array.
+
+import warnings
+
+import numpy as np
+
+METRICS = ('mape', 'rmse', 'smape', 'mase')
+
+
+def window_arrays(truth, forecasts: list):
+    """
+    Line up window forecasts with the observed series.
+
+    Args:
+        truth: Observed TimeSeries; forecasts must be on its time grid
+        forecasts: Window forecast TimeSeries, possibly of different lengths
+
+    Returns:
+        (actual, predicted, starts): float64 arrays of shape (windows, steps,
+        components), NaN where a forecast is shorter than the longest one or
+        runs past the end of `truth`, and the offset of each forecast's first
+        step in `truth` (-1 if it starts after the end)
+    """
+    steps = max(len(f) for f in forecasts)
+    components = truth.n_components
+    predicted = np.full((len(forecasts), steps, components), np.nan)
+    for i, forecast in enumerate(forecasts):
+        predicted[i, :len(forecast)] = forecast.values(copy=False)
+
+    starts = truth.time_index.get_indexer([f.start_time() for f in forecasts])
+    offsets = starts[:, None] + np.arange(steps)
+    covered = (starts[:, None] >= 0) & (offsets < len(truth)) & ~np.isnan(predicted[..., 0])
+    values = truth.values(copy=False)
+    actual = np.where(covered[..., None], values[np.where(covered, offsets, 0)], np.nan).astype(np.float64)
+    return actual, predicted, starts
+
+
+def naive_scale(values: np.ndarray, bounds) -> np.ndarray:
+    """
+    Mean absolute one-step naive error of each training window, the MASE denominator.
+
+    Args:
+        values: Observed values, shape (time, components)
+        bounds: (train_start, train_end) offset pairs, one per window
+
+    Returns:
+        Array of shape (windows, components)
+    """
+    diffs = np.abs(np.diff(values.astype(np.float64, copy=False), axis=0))
+    cumulative = np.concatenate([np.zeros((1, diffs.shape[1])), np.cumsum(diffs, axis=0)])
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 2)
+    starts, ends = bounds[:, 0], np.maximum(bounds[:, 1] - 1, bounds[:, 0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (cumulative[ends] - cumulative[starts]) / (ends - starts)[:, None]
+
+
+def score_arrays(actual: np.ndarray, predicted: np.ndarray, scale: np.ndarray = None) -> dict:
+    """
+    Score aligned (windows, steps, components) arrays in one pass.
+
+    Steps where the actual is NaN are ignored, as are actuals of zero for the
+    percentage errors.
+
+    Args:
+        actual: Observed values
+        predicted: Forecast values
+        scale: MASE denominators, shape (windows, components); None skips MASE
+
+    Returns:
+        Dict with one array per metric in METRICS (one value per window),
+        'step_mape' and 'step_mae' (one value per forecast step, over the
+        windows), 'covered' (windows with at least one observed step) and
+        'overall' (the mean of each per-window metric over covered windows)
+    """
+    error = actual - predicted
+    absolute = np.abs(error)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # means over windows with no observed step
+        ape = np.where(actual != 0, absolute / np.abs(actual) * 100.0, np.nan)
+        scores = {
+            'mape': np.nanmean(ape, axis=(1, 2)),
+            'rmse': np.sqrt(np.nanmean(error ** 2, axis=(1, 2))),
+            'smape': np.nanmean(200.0 * absolute / (np.abs(actual) + np.abs(predicted)), axis=(1, 2)),
+            'mase': (np.nanmean(np.nanmean(absolute, axis=1) / scale, axis=1)
+                     if scale is not None else np.full(len(actual), np.nan)),
+        }
+        covered = ~np.isnan(actual).all(axis=(1, 2))
+        scores['step_mape'] = np.nanmean(ape[covered], axis=(0, 2))
+        scores['step_mae'] = np.nanmean(absolute[covered], axis=(0, 2))
+        scores['covered'] = covered
+        scores['overall'] = {name: float(np.nanmean(scores[name][covered])) if covered.any() else float('nan')
+                             for name in METRICS}
+    return scores
+
+
+def score_windows(truth, forecasts: list, bounds=None) -> dict:
+    """
+    MAPE, RMSE, sMAPE and MASE of every window forecast against `truth`, plus
+    per-step errors, without slicing `truth` per window.
+
+    Args:
+        truth: Observed TimeSeries covering the forecasts (steps past its end are ignored)
+        forecasts: Window forecast TimeSeries on the same time grid
+        bounds: (train_start, train_end) offsets of each window's training data,
+            for the MASE scale; None assumes everything before the forecast
+
+    Returns:
+        As score_arrays
+    """
+    actual, predicted, starts = window_arrays(truth, forecasts)
+    if bounds is None:
+        bounds = [(0, max(start, 0)) for start in starts]
+    return score_arrays(actual, predicted, naive_scale(truth.values(copy=False), bounds))
+
+
+def metric_row(label: str, scores: dict, per_window: bool = True) -> dict:
+    """
+    Metrics table row for score_windows output: per-window lists for covered
+    windows (None where a metric is undefined), or the single window's values.
+    """
+    covered = scores['covered']
+    row = {'model': label}
+    for name in METRICS:
+        values = [float(v) if np.isfinite(v) else None for v in scores[name][covered]]
+        row[name] = values if per_window else (values[0] if values else None)
+    return row
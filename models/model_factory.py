@@ -1,21 +1,148 @@
 # cap_poc/models/model_factory.py
 
-from darts.models import (
-    ARIMA,
-    Prophet,
-    ExponentialSmoothing,
-    Theta
-)
+import importlib
+import importlib.util
+import sys
+import time
+
+# Imported by every darts model module; its cost is shared, not any one model's
+SHARED_MODULE = "darts.models.forecasting.forecasting_model"
+
+
+def _defer_models_package():
+    """
+    Register the `darts.models` package without running its __init__.
+
+    darts.models/__init__.py imports every model darts has (Prophet and the
+    Torch models included, when installed), and Python runs it before any of
+    its submodules. Registered this way, importing one model's module loads
+    only that module and what it imports itself. The full __init__ still runs,
+    once, the first time anything looks up a name on the package, e.g.
+    `from darts.models import Theta`.
+    """
+    if "darts.models" in sys.modules:
+        return
+    spec = importlib.util.find_spec("darts.models")
+    package = importlib.util.module_from_spec(spec)
+
+    def __getattr__(name):
+        package.__dict__.pop("__getattr__", None)
+        spec.loader.exec_module(package)
+        return getattr(package, name)
+
+    package.__getattr__ = __getattr__
+    sys.modules["darts.models"] = package
+    setattr(sys.modules["darts"], "models", package)
+
+
+class LazyModel:
+    """
+    Constructor for a darts model class that is only imported on first use.
+
+    Calling it builds a model instance, exactly like calling the class itself.
+    Only the model's own module is imported, not the whole `darts.models`
+    package (see _defer_models_package).
+    """
+
+    def __init__(self, module: str, attr: str):
+        self.module = module
+        self.attr = attr
+        self._cls = None
+        self.import_seconds = None
+
+    def resolve(self):
+        if self._cls is None:
+            import_shared()
+            start = time.perf_counter()
+            self._cls = getattr(importlib.import_module(self.module), self.attr)
+            self.import_seconds = time.perf_counter() - start
+        return self._cls
+
+    @property
+    def resolved(self) -> bool:
+        return self._cls is not None
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyModel({self.module}.{self.attr})"
+
+
+_shared_seconds = None
+
+
+def import_shared() -> float:
+    """Import what every darts model needs (darts itself and the model base classes), once."""
+    global _shared_seconds
+    if _shared_seconds is None:
+        start = time.perf_counter()
+        importlib.import_module("darts")
+        _defer_models_package()
+        importlib.import_module(SHARED_MODULE)
+        _shared_seconds = time.perf_counter() - start
+    return _shared_seconds
+
 
 AVAILABLE_MODELS = {
-    "arima": ARIMA,
-    "prophet": Prophet,
-    "exponentialsmoothing": ExponentialSmoothing,
-    "theta": Theta
+    "arima": LazyModel("darts.models.forecasting.arima", "ARIMA"),
+    "prophet": LazyModel("darts.models.forecasting.prophet_model", "Prophet"),
+    "exponentialsmoothing": LazyModel("darts.models.forecasting.exponential_smoothing", "ExponentialSmoothing"),
+    "theta": LazyModel("darts.models.forecasting.theta", "Theta")
 }
 
-def get_model(name: str):
+# Constructor parameters darts expects as enums. JSON-friendly params (tuned
+# configurations, job parameters) give them by value, e.g. 'additive'.
+ENUM_PARAMS = {
+    "exponentialsmoothing": {"trend": "ModelMode", "seasonal": "SeasonalityMode"},
+    "theta": {"season_mode": "SeasonalityMode"},
+}
+
+
+def _coerce_params(name: str, params: dict) -> dict:
+    enums = {key: kind for key, kind in ENUM_PARAMS.get(name, {}).items() if isinstance(params.get(key), str)}
+    if not enums:
+        return params
+    import darts.utils.utils as darts_utils
+    return {**params, **{key: getattr(darts_utils, kind)(params[key]) for key, kind in enums.items()}}
+
+
+def get_model(name: str, params: dict = None):
     name = name.lower()
     if name not in AVAILABLE_MODELS:
         raise ValueError(f"Unsupported model: {name}")
-    return AVAILABLE_MODELS[name]()
\ No newline at end of file
+    return AVAILABLE_MODELS[name](**_coerce_params(name, params or {}))
+
+
+def import_times() -> dict:
+    """Seconds spent importing each model resolved so far in this process."""
+    return {name: model.import_seconds for name, model in AVAILABLE_MODELS.items() if model.resolved}
+
+
+def check_import_budget(budget_seconds: float, names: list = None) -> dict:
+    """
+    Resolve the given models (all of them by default) and check that importing
+    them stayed within `budget_seconds`.
+
+    The import every model shares (darts and the model base classes) is
+    measured once and reported on its own under 'shared', so each model's time
+    is only what it adds. Imports that already happened in this process count
+    with the time they took back then. Models whose dependencies are not
+    installed are reported as None.
+
+    Returns:
+        Dict of import seconds per model plus 'shared'; raises RuntimeError
+        when their total is over budget
+    """
+    names = [n.lower() for n in (names or AVAILABLE_MODELS)]
+    shared = import_shared()
+    for name in names:
+        try:
+            AVAILABLE_MODELS[name].resolve()
+        except ImportError:
+            pass
+    times = {'shared': shared, **{name: AVAILABLE_MODELS[name].import_seconds for name in names}}
+    total = sum(t for t in times.values() if t is not None)
+    if total > budget_seconds:
+        raise RuntimeError(f"Model imports took {total:.2f}s, over the {budget_seconds:.2f}s budget: {times}")
+    return times
@@ -0,0 +1,145 @@
+# cap_poc/models/online.py
+
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+
+from .ensemble import ensemble_forecasts
+from .forecast import _fit_predict
+from .warm_start import supports_state_update, warm_refit
+
+
+class OnlineForecaster:
+    """
+    Stateful forecasting session for a series that grows by appended observations.
+
+    The session fits each model once on the initial data. Each later `update` then
+    carries the fitted state forward over the new points instead of refitting:
+    - ARIMA runs the Kalman filter over the new observations.
+    - ExponentialSmoothing and Theta re-run their smoothing recursions with the
+      fitted parameters held fixed.
+    A model is fully re-estimated when either of these happens:
+    - `refit_every` points have arrived since its last fit.
+    - Its one-step-ahead MAPE over the last `drift_window` points exceeds
+      `drift_threshold` percent.
+    Models without a state update (Prophet) are refitted on every update.
+
+    Args:
+        models: Model names as accepted by get_model
+        n_days: Forecast horizon, in steps of the series frequency
+        ensemble: Also publish the mean of the model forecasts
+        model_params: Optional dict of constructor params per model name
+        refit_every: Appended points between scheduled full refits (None to disable)
+        drift_threshold: One-step MAPE, in percent, that triggers a full refit (None to disable)
+        drift_window: Number of recent one-step errors the drift check averages over
+    """
+
+    def __init__(self, models: list, n_days: int, ensemble: bool = False, model_params: dict = None,
+                 refit_every: int = None, drift_threshold: float = None, drift_window: int = 60):
+        self.models = [m for m in models if m.lower() != "ensemble"]
+        self.n_days = n_days
+        self.ensemble = ensemble
+        self.model_params = {name.lower(): params for name, params in (model_params or {}).items()}
+        self.refit_every = refit_every
+        self.drift_threshold = drift_threshold
+        self.drift_window = drift_window
+
+        self.series = None
+        self.model_instances = {}
+        self.forecasts = {}
+        self.since_refit = {}
+        self.errors = {}
+        self.stats = {'updates': 0, 'refits': {}, 'last_update_seconds': None}
+
+    def start(self, df) -> dict:
+        """
+        Fit every model on the initial data.
+
+        Args:
+            df: DataFrame with 'date' and 'value' columns
+
+        Returns:
+            Dict of model name to its future forecast
+        """
+        self.series = TimeSeries.from_dataframe(df, time_col='date', value_cols='value')
+        for model_name in self.models:
+            self._refit(model_name)
+        return self._publish()
+
+    def update(self, df) -> dict:
+        """
+        Append new observations and roll every model's forecast forward.
+
+        Args:
+            df: DataFrame with 'date' and 'value' columns holding the points that
+                directly follow the current series, in order
+
+        Returns:
+            Dict of model name to its updated future forecast
+        """
+        if self.series is None:
+            raise RuntimeError("Call start() before update()")
+
+        start = time.perf_counter()
+        new_values = self._new_values(df)
+        if len(new_values) == 0:
+            return self._publish()
+        self.series = self.series.append_values(new_values)
+
+        for model_name in self.models:
+            self._track_errors(model_name, new_values)
+            self.since_refit[model_name] += len(new_values)
+
+            if self._needs_refit(model_name):
+                self._refit(model_name)
+            else:
+                model = warm_refit(model_name, self.model_instances[model_name], self.series)
+                self.model_instances[model_name] = model
+                self.forecasts[model_name] = model.predict(self.n_days)
+
+        self.stats['updates'] += 1
+        self.stats['last_update_seconds'] = time.perf_counter() - start
+        return self._publish()
+
+    def _new_values(self, df) -> np.ndarray:
+        dates = pd.to_datetime(df['date'])
+        expected = pd.date_range(self.series.end_time(), periods=len(df) + 1, freq=self.series.freq)[1:]
+        if len(df) > 0 and not (dates.values == expected.values).all():
+            raise ValueError(f"Appended points must continue the series at {self.series.freq_str} "
+                             f"steps from {self.series.end_time()}")
+        return df['value'].to_numpy(dtype=self.series.dtype)
+
+    def _track_errors(self, model_name, new_values):
+        # The published forecast's first steps are one-step-ahead predictions of the new points
+        predicted = self.forecasts[model_name].values(copy=False).ravel()[:len(new_values)]
+        actual = new_values[:len(predicted)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ape = np.abs((actual - predicted) / actual) * 100.0
+        self.errors[model_name].extend(ape[np.isfinite(ape)])
+
+    def _needs_refit(self, model_name) -> bool:
+        if not supports_state_update(model_name):
+            return True
+        if self.refit_every is not None and self.since_refit[model_name] >= self.refit_every:
+            return True
+        errors = self.errors[model_name]
+        if self.drift_threshold is not None and len(errors) == errors.maxlen:
+            return float(np.mean(errors)) > self.drift_threshold
+        return False
+
+    def _refit(self, model_name):
+        model, forecast = _fit_predict(model_name, self.series, self.n_days, self.model_params.get(model_name.lower()))
+        self.model_instances[model_name] = model
+        self.forecasts[model_name] = forecast
+        self.since_refit[model_name] = 0
+        self.errors[model_name] = deque(maxlen=self.drift_window)
+        self.stats['refits'][model_name] = self.stats['refits'].get(model_name, 0) + 1
+
+    def _publish(self) -> dict:
+        forecasts = dict(self.forecasts)
+        if self.ensemble and len(forecasts) > 1:
+            forecasts['Ensemble'] = ensemble_forecasts(list(forecasts.values()))
+        return forecasts
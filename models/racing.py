@@ -0,0 +1,62 @@
+# cap_poc/models/racing.py
+
+import math
+
+import numpy as np
+
+# Backtest windows each model has been scored on when a pruning decision is made
+RACE_ROUNDS = (3, 9)
+# Fraction of the remaining models kept after each round
+RACE_KEEP = 0.5
+# Models whose error is within this fraction of the leader's are never pruned
+RACE_TOLERANCE = 0.10
+
+
+def race_ends(bounds: dict, series_length: int, n_days: int, rounds=RACE_ROUNDS) -> list:
+    """
+    Pick the backtest windows each racing round adds.
+
+    Only windows every model has (the same training end) and whose forecasts
+    fall inside the series are candidates. Each round's cumulative set is
+    spread evenly over them, so early rounds already see both old and recent
+    parts of the series.
+
+    Args:
+        bounds: Model name to its (train_start, train_end) window list
+        series_length: Length of the full series
+        n_days: Forecast horizon
+        rounds: Cumulative number of windows after each round
+
+    Returns:
+        One list of training ends per round, the windows that round adds
+    """
+    common = set.intersection(*({end for _, end in model_bounds} for model_bounds in bounds.values()))
+    candidates = sorted(end for end in common if end + n_days <= series_length)
+    chosen, schedule = set(), []
+    for count in rounds:
+        if len(chosen) >= len(candidates):
+            break
+        picks = np.linspace(0, len(candidates) - 1, min(count, len(candidates))).round().astype(int)
+        new = sorted({candidates[i] for i in picks} - chosen)
+        if new:
+            schedule.append(new)
+            chosen.update(new)
+    return schedule
+
+
+def prune(errors: dict, keep: float = RACE_KEEP, tolerance: float = RACE_TOLERANCE) -> set:
+    """
+    Models to drop after a round: those outside the best `keep` fraction whose
+    error is also more than `tolerance` above the leader's.
+
+    Args:
+        errors: Model name to its mean error over the windows raced so far
+
+    Returns:
+        Set of model names to prune; never the whole field
+    """
+    errors = {name: math.inf if math.isnan(error) else error for name, error in errors.items()}  # unscored is worst
+    ranked = sorted(errors, key=lambda name: errors[name])
+    best = errors[ranked[0]]
+    kept = max(1, math.ceil(len(ranked) * keep))
+    return {name for name in ranked[kept:] if not errors[name] <= best * (1 + tolerance)}
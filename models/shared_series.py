@@ -0,0 +1,111 @@
+# cap_poc/models/shared_series.py
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from darts import TimeSeries
+
+# Segments a worker keeps attached; older ones are released once no view uses them
+MAX_ATTACHED = 8
+
+_attached = OrderedDict()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment once per process and keep it open for later jobs of the run."""
+    if name in _attached:
+        _attached.move_to_end(name)
+        return _attached[name]
+
+    # The creating process owns and unlinks the segment. Pool workers share its
+    # resource tracker, where registering an attached segment again is a no-op
+    try:
+        segment = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+    _attached[name] = segment
+
+    for old_name in list(_attached)[:-MAX_ATTACHED]:
+        try:
+            _attached[old_name].close()
+        except BufferError:
+            continue  # still viewed by a live series
+        del _attached[old_name]
+    return segment
+
+
+class SharedSeries:
+    """
+    Picklable handle on a TimeSeries whose values live in shared memory.
+
+    Only the segment name, the shape and the regular time index (start and
+    frequency) travel to the worker. Slicing with [a:b] gives another handle,
+    and `to_timeseries()` wraps the shared buffer in a TimeSeries without
+    copying it.
+    """
+
+    def __init__(self, name: str, shape: tuple, dtype: str, start, freq, columns: list,
+                 offset: int = 0, stop: int = None):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.start = start
+        self.freq = freq
+        self.columns = columns
+        self.offset = offset
+        self.stop = shape[0] if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.offset
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("SharedSeries only supports slicing")
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("SharedSeries slices must be contiguous")
+        return SharedSeries(self.name, self.shape, self.dtype, self.start, self.freq, self.columns,
+                            self.offset + start, self.offset + max(start, stop))
+
+    def values(self) -> np.ndarray:
+        buffer = np.ndarray(self.shape, dtype=self.dtype, buffer=_attach(self.name).buf)
+        return buffer[self.offset:self.stop]
+
+    def time_index(self) -> pd.Index:
+        if isinstance(self.start, pd.Timestamp):
+            return pd.date_range(self.start, periods=self.stop, freq=self.freq)[self.offset:]
+        return pd.RangeIndex(self.start + self.offset * self.freq, self.start + self.stop * self.freq, self.freq)
+
+    def to_timeseries(self) -> TimeSeries:
+        return TimeSeries.from_times_and_values(self.time_index(), self.values(), columns=self.columns, copy=False)
+
+
+def as_timeseries(series) -> TimeSeries:
+    """The TimeSeries behind a SharedSeries handle; plain TimeSeries pass through."""
+    return series.to_timeseries() if isinstance(series, SharedSeries) else series
+
+
+@contextmanager
+def share_series(ts: TimeSeries):
+    """
+    Copy the values of `ts` into a new shared memory segment for the duration
+    of the block.
+
+    Yields:
+        A SharedSeries handle covering the whole series
+    """
+    values = ts.values(copy=False)
+    segment = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+    try:
+        np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)[:] = values
+        if ts.has_datetime_index:
+            start, freq = ts.start_time(), ts.freq
+        else:
+            start, freq = ts.time_index.start, ts.time_index.step
+        yield SharedSeries(segment.name, values.shape, values.dtype.str, start, freq, list(ts.components))
+    finally:
+        segment.close()
+        segment.unlink()
@@ -0,0 +1,38 @@
+# cap_poc/models/sqlite_util.py
+
+import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def connect(db_path):
+    """Short-lived connection that commits on success and is always closed."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def init_db(db_path, schema: list, added_columns: dict = None):
+    """
+    Create a database shared between processes: WAL mode, so readers don't
+    block the writer, then the `schema` statements (CREATE ... IF NOT EXISTS).
+
+    Args:
+        db_path: Database file
+        schema: SQL statements to run
+        added_columns: Table name to {column: type} for columns added after the
+            table was first released; databases created earlier gain them
+    """
+    with connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in schema:
+            conn.execute(statement)
+        for table, columns in (added_columns or {}).items():
+            existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
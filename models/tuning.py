@@ -0,0 +1,269 @@
+# cap_poc/models/tuning.py
+
+import itertools
+import logging
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, nullcontext
+
+from utils.telemetry import span
+from .backtest import backtest_schedule, fit_window, window_bounds
+from .cache import make_key, series_fingerprint
+from .executor import iter_jobs
+from .fast_backtest import fast_backtest, supports_fast_backtest
+from .forecast import split_series
+from .metrics import METRICS, score_windows
+from .model_factory import get_model
+from .shared_series import as_timeseries, share_series
+
+logger = logging.getLogger(__name__)
+
+# Candidate values per constructor parameter. Enum parameters are given by
+# value (see model_factory.ENUM_PARAMS), so configurations stay JSON-friendly.
+SEARCH_SPACES = {
+    "arima": {"p": [1, 2, 7], "d": [0, 1], "q": [0, 1]},
+    "exponentialsmoothing": {
+        "trend": [None, "additive"],
+        "damped": [False, True],
+        "seasonal": [None, "additive", "multiplicative"],
+    },
+    "theta": {"theta": [1, 2, 3], "season_mode": ["multiplicative", "additive"]},
+    "prophet": {"seasonality_mode": ["additive", "multiplicative"], "changepoint_prior_scale": [0.01, 0.05, 0.5]},
+}
+
+# Backtest windows per cross-validated trial; fewer than a full CV run, as only the ranking matters
+TRIAL_WINDOWS = 10
+
+
+def _valid(model_name: str, config: dict) -> bool:
+    # A damped trend needs a trend to damp
+    return not (model_name == "exponentialsmoothing" and config.get("damped") and not config.get("trend"))
+
+
+def candidates(model_name: str, space: dict = None, search: str = 'grid', n_trials: int = None,
+               seed: int = None) -> list:
+    """
+    Parameter configurations to try.
+
+    Args:
+        model_name: Model name as accepted by get_model
+        space: Parameter name to candidate values (defaults to SEARCH_SPACES)
+        search: 'grid' tries every combination, 'random' a sample of `n_trials` of them
+        n_trials: Number of configurations for random search
+        seed: Random search seed
+
+    Returns:
+        List of parameter dicts
+    """
+    model_name = model_name.lower()
+    space = SEARCH_SPACES.get(model_name, {}) if space is None else space
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    grid = [config for config in grid if _valid(model_name, config)]
+    if search == 'grid':
+        return grid
+    if search == 'random':
+        return random.Random(seed).sample(grid, min(n_trials or len(grid), len(grid)))
+    raise ValueError(f"Unknown search '{search}', expected 'grid' or 'random'")
+
+
+def run_trial(model_name, series, params, n_days, split_idx, cross_validate=False, window_type='expanding',
+              cv_engine='refit', windows=TRIAL_WINDOWS, max_lookback=None) -> dict:
+    """
+    Score one configuration on the 80/20 split, or on a short backtest when
+    `cross_validate`, training on at most `max_lookback` points like Forecast
+    does. Runs inside a worker; failures are returned, not raised.
+
+    Returns:
+        Dict with the overall value of each metric in METRICS and `error`
+        (None on success)
+    """
+    series = as_timeseries(series)
+    try:
+        with span('trial', model_name, length=len(series), cross_validate=cross_validate):
+            if cross_validate:
+                start, stride = backtest_schedule(len(series), n_days, windows)
+                min_train_length = get_model(model_name, params).min_train_series_length
+                bounds = window_bounds(len(series), start, stride, min_train_length, window_type, max_lookback)
+                # Capped lookbacks turn expanding windows into sliding ones, which the fast engine does not support
+                if (cv_engine == 'fast' and max_lookback is None
+                        and supports_fast_backtest(model_name, window_type, params)):
+                    forecasts = fast_backtest(model_name, series, bounds, n_days, params)
+                else:
+                    forecasts = [fit_window(model_name, series, train_start, train_end, n_days, params)
+                                 for train_start, train_end in bounds]
+            else:
+                train_start = 0 if max_lookback is None else max(0, split_idx - max_lookback)
+                model = get_model(model_name, params)
+                model.fit(series[train_start:split_idx])
+                forecasts, bounds = [model.predict(len(series) - split_idx)], [(train_start, split_idx)]
+            scores = score_windows(series, forecasts, bounds)['overall']
+    except Exception as e:
+        return {**{name: None for name in METRICS}, 'error': f"{type(e).__name__}: {e}"}
+    return {**scores, 'error': None}
+
+
+class Tuner:
+    """
+    Hyperparameter search for one model, with trials spread over a worker pool.
+
+    Every configuration from `candidates` is merged over `base_params` and
+    scored by `run_trial`; the lowest `metric` wins. Trial scores are memoized
+    in `cache` (a ForecastCache) by data hash and parameters, so re-tuning the
+    same series only fits new configurations. With `patience`, the search stops
+    once that many trials in a row (in completion order) failed to improve on
+    the best score, and trials not started yet are cancelled. With a `store`
+    (ForecastStore) and a series ID, the best parameters are saved there, and
+    Forecast runs for that series then use them.
+
+    Args:
+        model_name: Model name as accepted by get_model
+        space: Search space (defaults to SEARCH_SPACES[model_name])
+        search: 'grid' or 'random'
+        n_trials: Number of configurations for random search
+        seed: Random search seed
+        base_params: Parameters every trial shares, e.g. {'seasonal_periods': 7}
+        metric: Metric to minimize, one of METRICS
+        cross_validate: Score trials on a backtest instead of the 80/20 split
+        window_type: Backtest window type
+        cv_engine: 'refit' or 'fast' (see Forecast.fit_and_forecast)
+        executor: 'process', 'thread', 'serial' or an Executor instance
+        max_workers: Worker count for pooled executors
+        patience: Trials without improvement before stopping early (None to try all)
+        cache: Optional ForecastCache for trial scores
+        store: Optional ForecastStore for the best parameters
+        resample: Pandas frequency to aggregate the series to first (see split_series)
+        max_lookback: Train every trial on at most this many points (see Forecast)
+        dtype: Value dtype of the series (see split_series)
+    """
+
+    def __init__(self, model_name: str, space: dict = None, search: str = 'grid', n_trials: int = None,
+                 seed: int = None, base_params: dict = None, metric: str = 'mape', cross_validate: bool = False,
+                 window_type: str = 'expanding', cv_engine: str = 'refit', executor='process',
+                 max_workers: int = None, patience: int = None, cache=None, store=None, resample: str = None,
+                 max_lookback: int = None, dtype: str = 'float64'):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        self.model_name = model_name.lower()
+        self.configs = candidates(self.model_name, space, search, n_trials, seed)
+        self.base_params = base_params or {}
+        self.metric = metric
+        self.cross_validate = cross_validate
+        self.window_type = window_type
+        self.cv_engine = cv_engine
+        self.executor = executor
+        self.max_workers = max_workers
+        self.patience = patience
+        self.cache = cache
+        self.store = store
+        self.resample = resample
+        self.max_lookback = max_lookback
+        self.dtype = dtype
+
+    def _key(self, series_hash, params, n_days):
+        # The series hash is taken after resampling and the dtype cast, so neither needs a place in the key
+        engine = {'cv_engine': self.cv_engine, 'windows': TRIAL_WINDOWS} if self.cross_validate else {}
+        lookback = {'max_lookback': self.max_lookback} if self.max_lookback is not None else {}
+        return make_key(series_hash, self.model_name, params, n_days, phase='trial',
+                        cross_validate=self.cross_validate, window_type=self.window_type, **engine, **lookback)
+
+    def _score(self, result) -> float:
+        score = result.get(self.metric)
+        return math.inf if score is None or math.isnan(score) else score
+
+    def tune(self, df, n_days: int, series_id: str = None) -> dict:
+        """
+        Search the configurations on one series.
+
+        Returns:
+            Dict with `model`, the best `params` (None if every trial failed),
+            its `score`, the `metric`, every finished `trial` (params, scores,
+            error, whether it came from the cache) in completion order, and
+            whether the search `stopped_early`
+        """
+        ts, split_idx = split_series(df, self.resample, self.dtype)
+        series_hash = series_fingerprint(ts) if self.cache is not None else None
+        trials, jobs = [], []
+        for i, config in enumerate(self.configs):
+            params = {**self.base_params, **config}
+            cached = self.cache.get(self._key(series_hash, params, n_days)) if self.cache is not None else None
+            if cached is not None:
+                trials.append({'params': params, **cached, 'cached': True})
+            else:
+                jobs.append((i, params))
+
+        best, since_best, stopped_early = math.inf, 0, False
+
+        def record(trial):
+            nonlocal best, since_best
+            score = self._score(trial)
+            if score < best:
+                best, since_best = score, 0
+            else:
+                since_best += 1
+            return self.patience is not None and since_best >= self.patience
+
+        for trial in trials:  # cached trials count towards the patience too
+            stopped_early = record(trial) or stopped_early
+        if jobs and not stopped_early:
+            in_processes = self.executor == 'process' or isinstance(self.executor, ProcessPoolExecutor)
+            with span('tune', self.model_name, trials=len(jobs)):
+                with (share_series(ts) if in_processes else nullcontext(ts)) as source:
+                    params_of = dict(jobs)
+                    work = [(i, run_trial, (self.model_name, source, params, n_days, split_idx,
+                                            self.cross_validate, self.window_type, self.cv_engine,
+                                            TRIAL_WINDOWS, self.max_lookback))
+                            for i, params in jobs]
+                    with closing(iter_jobs(work, self.executor, self.max_workers)) as completed:
+                        for i, result in completed:
+                            if result['error'] is None and self.cache is not None:
+                                self.cache.put(self._key(series_hash, params_of[i], n_days), result)
+                            trials.append({'params': params_of[i], **result, 'cached': False})
+                            if record(trials[-1]):
+                                stopped_early = True
+                                break  # closing the generator cancels the trials not started yet
+
+        scored = [trial for trial in trials if self._score(trial) < math.inf]
+        winner = min(scored, key=self._score) if scored else None
+        logger.info("Tuned %s over %d trials (%d cached%s): best %s %s", self.model_name, len(trials),
+                    sum(trial['cached'] for trial in trials), ", stopped early" if stopped_early else "",
+                    self.metric, winner and winner[self.metric])
+        if winner is not None and self.store is not None and series_id is not None:
+            self.store.put_params(series_id, self.model_name, winner['params'], self.metric,
+                                  winner[self.metric], len(trials))
+        return {
+            'model': self.model_name,
+            'params': winner['params'] if winner else None,
+            'score': winner[self.metric] if winner else None,
+            'metric': self.metric,
+            'trials': trials,
+            'stopped_early': stopped_early,
+        }
+
+
+
+def tune_models(df, models: list, n_days: int, series_id: str = None, model_params: dict = None,
+                **tuner_options) -> dict:
+    """
+    Tune every built-in model in `models` on one series (the ensemble and
+    unknown names are skipped).
+
+    Args:
+        model_params: Per-model parameters kept fixed in every trial
+        tuner_options: Further Tuner arguments
+
+    Returns:
+        Model name (lower case) to its best parameters, for models with at
+        least one successful trial
+    """
+    fixed = {name.lower(): params for name, params in (model_params or {}).items()}
+    best = {}
+    for model_name in models:
+        name = model_name.lower()
+        if name not in SEARCH_SPACES:
+            continue
+        result = Tuner(name, base_params=fixed.get(name), **tuner_options).tune(df, n_days, series_id)
+        if result['params'] is not None:
+            best[name] = result['params']
+    return best
@@ -0,0 +1,141 @@
+# cap_poc/models/warm_start.py
+
+import copy
+
+import numpy as np
+from darts import TimeSeries
+from darts.utils.utils import SeasonalityMode
+
+
+
+def _extend_arima(model, series: TimeSeries):
+    """
+    Run the Kalman filter over the new observations only, starting from the fitted
+    end state; parameters are kept as estimated.
+    """
+    extended = copy.deepcopy(model)
+    new_points = series[len(model.training_series):]
+    if len(new_points) > 0:
+        extended.model = extended.model.extend(new_points.values(copy=False))
+    extended.training_series = series
+    return extended
+
+
+def _extend_exponential_smoothing(model, series: TimeSeries):
+    """
+    Continue the smoothing recursions over the new observations with the fitted
+    parameters held fixed, starting from the filtered states at the end of the fit.
+    """
+    import statsmodels.tsa.holtwinters as hw
+    results = model.model
+    params = results.params
+    trained = len(model.training_series)
+    if len(series) == trained:
+        return copy.copy(model)
+
+    # statsmodels needs at least two observations, so restart one step back and
+    # replay the last fitted point along with the new ones
+    constructor_kwargs = {
+        'initialization_method': 'known',
+        'initial_level': results.level[-2],
+    }
+    if model.trend is not None:
+        constructor_kwargs['initial_trend'] = results.trend[-2]
+    if model.seasonal is not None:
+        seasons = np.concatenate([params['initial_seasons'], results.season])
+        constructor_kwargs['initial_seasonal'] = seasons[-model.seasonal_periods - 1:-1]
+    if params.get('use_boxcox'):
+        constructor_kwargs['use_boxcox'] = params['lamda']
+
+    fit_kwargs = {
+        key: params[key]
+        for key in ('smoothing_level', 'smoothing_trend', 'smoothing_seasonal', 'damping_trend')
+        if params.get(key) is not None
+    }
+    hw_model = hw.ExponentialSmoothing(
+        series.values(copy=False)[trained - 1:].ravel(),
+        trend=model.trend if model.trend is None else model.trend.value,
+        damped_trend=model.damped,
+        seasonal=model.seasonal if model.seasonal is None else model.seasonal.value,
+        seasonal_periods=model.seasonal_periods,
+        **constructor_kwargs,
+    )
+
+    extended = copy.copy(model)
+    extended.model = hw_model.fit(optimized=False, **fit_kwargs)
+    extended.training_series = series
+    return extended
+
+
+def _extend_theta(model, series: TimeSeries):
+    """
+    Re-run the SES recursion over `series` with the fitted smoothing level, seasonal
+    profile and initial level held fixed, and refresh the drift term.
+    """
+    import statsmodels.tsa.holtwinters as hw
+    extended = copy.deepcopy(model)
+    values = series.values(copy=False).ravel()
+
+    if model.is_seasonal:
+        # Repeat the fitted seasonal profile over the new points
+        fitted = model.seasonality.values(copy=False).ravel()
+        period = model.season_period
+        seasonal = np.concatenate([
+            fitted,
+            fitted[len(fitted) - period + np.arange(len(values) - len(fitted)) % period],
+        ])
+        extended.seasonality = TimeSeries.from_times_and_values(series.time_index, seasonal)
+        if model.season_mode is SeasonalityMode.MULTIPLICATIVE:
+            values = values / seasonal
+        else:
+            values = values - seasonal
+
+    extended.model = hw.SimpleExpSmoothing(
+        values,
+        initialization_method='known',
+        initial_level=model.model.params['initial_level'],
+    ).fit(smoothing_level=model.alpha, optimized=False)
+
+    b_theta = np.polyfit(np.arange(len(values)), (1.0 - model.theta) * values, 1)[0]
+    extended.coef = b_theta / (-model.theta)
+    extended.length = len(values)
+    extended.training_series = series
+    return extended
+
+
+# Models whose fitted state can be carried forward onto a longer series.
+STATE_UPDATES = {
+    "arima": _extend_arima,
+    "exponentialsmoothing": _extend_exponential_smoothing,
+    "theta": _extend_theta,
+}
+
+# The subset Forecast uses to extend its validation fits over the 20% holdout.
+WARM_REFITS = {"arima", "exponentialsmoothing", "theta"}
+
+
+def supports_warm_refit(name: str) -> bool:
+    return name.lower() in WARM_REFITS
+
+
+def supports_state_update(name: str) -> bool:
+    return name.lower() in STATE_UPDATES
+
+
+def warm_refit(name: str, model, series: TimeSeries):
+    """
+    Extend a model fitted on a prefix of `series` to the full series without
+    re-estimating it from scratch.
+
+    Args:
+        name: Model name as accepted by get_model
+        model: Fitted darts model whose training series is a prefix of `series`
+        series: The full series
+
+    Returns:
+        A fitted model positioned at the end of `series`; `model` is left untouched
+    """
+    trained = model.training_series
+    if trained.start_time() != series.start_time() or len(trained) > len(series):
+        raise ValueError(f"{name} was not fitted on a prefix of the series")
+    return STATE_UPDATES[name.lower()](model, series)
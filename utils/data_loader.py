@@ -1,27 +1,94 @@
 import pandas as pd
 import base64
+import csv
 import io
 
+from .telemetry import span
 
-def parse_csv_contents(contents):
+# pyarrow parses multi-threaded straight from the bytes buffer; the C engine
+# is still used for chunked reads, which pyarrow does not support.
+CSV_ENGINE = 'pyarrow'
+
+
+def parse_csv_contents(contents, chunksize=None):
     """
     Parses the base64-encoded CSV file content uploaded via Dash Upload component.
     Returns a pandas DataFrame with parsed date column.
     """
-    content_type, content_string = contents.split(',')
+    content_type, content_string = contents.split(',', 1)
 
     decoded = base64.b64decode(content_string)
-    df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+    return parse_csv_bytes(decoded, chunksize=chunksize)
+
+
+def parse_csv_bytes(data, chunksize=None):
+    """
+    Parses raw CSV bytes into a DataFrame with `date` and `value` columns.
+
+    The bytes are read in place (no intermediate str copy), only the two
+    expected columns are materialized, and the sort is skipped when the dates
+    are already in order.
 
+    Args:
+        data: CSV file content as bytes, bytearray or memoryview
+        chunksize: If set, read this many rows at a time to bound parser memory
+
+    Returns:
+        pandas DataFrame with columns `date` (datetime64) and `value` (float64)
+    """
     # Standardize column names (in case)
-    df.columns = df.columns.str.strip().str.lower()
+    header = _read_header(data)
+    names = {name: name.strip().lower() for name in header}
+    originals = {normalized: name for name, normalized in names.items()}
 
     # Ensure expected columns
-    if 'date' not in df.columns or 'value' not in df.columns:
+    if 'date' not in originals or 'value' not in originals:
         raise ValueError("CSV must contain 'date' and 'value' columns.")
 
-    df['date'] = pd.to_datetime(df['date'])
-    df.sort_values('date', inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    read_kwargs = dict(
+        usecols=[originals['date'], originals['value']],
+        dtype={originals['value']: 'float64'},
+        parse_dates=[originals['date']],
+    )
+    with span('parse', bytes=len(data)) as attrs:
+        buffer = io.BytesIO(data)
+        if chunksize:
+            chunks = pd.read_csv(buffer, chunksize=chunksize, **read_kwargs)
+            df = pd.concat(chunks, ignore_index=True)
+        else:
+            df = pd.read_csv(buffer, engine=CSV_ENGINE, **read_kwargs)
+
+        df = df.rename(columns=names)[['date', 'value']]
+        df['date'] = pd.to_datetime(df['date'])
+        if not df['date'].is_monotonic_increasing:
+            df.sort_values('date', inplace=True)
+            df.reset_index(drop=True, inplace=True)
+        attrs['length'] = len(df)
+
+    return df
+
+
+def load_series_file(path, chunksize=None):
+    """
+    Loads a CSV or Parquet file from disk into the same `date`/`value` frame
+    that parse_csv_contents returns.
+    """
+    if path.lower().endswith('.parquet'):
+        df = pd.read_parquet(path)
+        df.columns = df.columns.str.strip().str.lower()
+        if 'date' not in df.columns or 'value' not in df.columns:
+            raise ValueError("File must contain 'date' and 'value' columns.")
+        df = df[['date', 'value']]
+        df['date'] = pd.to_datetime(df['date'])
+        if not df['date'].is_monotonic_increasing:
+            df = df.sort_values('date', ignore_index=True)
+        return df
+
+    with open(path, 'rb') as f:
+        return parse_csv_bytes(f.read(), chunksize=chunksize)
+
 
-    return df
\ No newline at end of file
+def _read_header(data):
+    end = bytes(data[:64 * 1024]).find(b'\n')
+    first_line = bytes(data[:end if end >= 0 else len(data)]).decode('utf-8-sig')
+    return next(csv.reader([first_line]), [])
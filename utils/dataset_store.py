@@ -0,0 +1,95 @@
+# cap_poc/utils/dataset_store.py
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .data_loader import parse_csv_contents
+
+DEFAULT_STORE_DIR = os.environ.get('DATASET_STORE_DIR', os.path.join(tempfile.gettempdir(), 'dataset_store'))
+
+
+class DatasetStore:
+    """
+    Server-side registry of uploaded datasets.
+
+    An upload is parsed once and written to disk as Parquet under an ID derived
+    from its contents; the browser only keeps that ID. Recently used frames
+    stay in a bounded in-memory LRU so later callbacks skip the disk read too.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_items: int = 8):
+        self.root = root
+        self.max_items = max_items
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, dataset_id, ext):
+        return os.path.join(self.root, f"{dataset_id}.{ext}")
+
+    def _remember(self, dataset_id, df):
+        with self._lock:
+            self._frames[dataset_id] = df
+            self._frames.move_to_end(dataset_id)
+            while len(self._frames) > self.max_items:
+                self._frames.popitem(last=False)
+
+    def put_contents(self, contents: str, filename: str = None) -> str:
+        """
+        Register a Dash Upload payload and return its dataset ID.
+
+        Re-uploading the same file returns the existing ID without parsing again.
+        """
+        dataset_id = hashlib.sha256(contents.encode()).hexdigest()[:32]
+        if dataset_id in self._frames or os.path.exists(self._path(dataset_id, 'parquet')):
+            return dataset_id
+
+        df = parse_csv_contents(contents)
+        self.put_frame(dataset_id, df, filename)
+        return dataset_id
+
+    def put_frame(self, dataset_id: str, df: pd.DataFrame, filename: str = None):
+        """Store an already parsed frame under `dataset_id`."""
+        df.to_parquet(self._path(dataset_id, 'parquet'), index=False)
+        with open(self._path(dataset_id, 'json'), 'w') as f:
+            json.dump({'filename': filename, 'rows': len(df)}, f)
+        self._remember(dataset_id, df)
+
+    def get(self, dataset_id: str) -> pd.DataFrame:
+        """Return the parsed frame for `dataset_id`; raises KeyError if it is unknown."""
+        with self._lock:
+            df = self._frames.get(dataset_id)
+            if df is not None:
+                self._frames.move_to_end(dataset_id)
+                return df
+
+        path = self._path(dataset_id, 'parquet')
+        if not os.path.exists(path):
+            raise KeyError(f"Unknown dataset: {dataset_id}")
+        df = pd.read_parquet(path)
+        self._remember(dataset_id, df)
+        return df
+
+    def metadata(self, dataset_id: str) -> dict:
+        try:
+            with open(self._path(dataset_id, 'json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+
+_default_store = None
+
+
+def default_store() -> DatasetStore:
+    """Process-wide store shared by the app callbacks."""
+    global _default_store
+    if _default_store is None:
+        _default_store = DatasetStore()
+    return _default_store
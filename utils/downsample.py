@@ -0,0 +1,50 @@
+# cap_poc/utils/downsample.py
+
+import numpy as np
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, for every bucket in between, the point
+    forming the largest triangle with the previously kept point and the mean of
+    the next bucket. Peaks and troughs survive, unlike plain striding.
+
+    Args:
+        x: Monotonic x values (numbers, or datetime64 which is read as int64)
+        y: Values, same length as x
+        n_out: Number of points to keep
+
+    Returns:
+        Sorted integer indices of the kept points
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view(np.int64)
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+
+    return keep
@@ -0,0 +1,224 @@
+# cap_poc/utils/telemetry.py
+
+import bisect
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the span duration histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class SpanStats:
+    """
+    Duration histograms per (span, model).
+
+    `rows()` gives a plain, picklable and JSON-friendly copy that `merge` adds
+    into another SpanStats, which is how spans recorded in worker processes
+    reach the process that serves the metrics.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.series = {}  # (span, model) -> [count, total seconds, max seconds, per-bucket counts]
+
+    def _entry(self, name, model):
+        key = (name, model)
+        if key not in self.series:
+            self.series[key] = [0, 0.0, 0.0, [0] * len(self.buckets)]
+        return self.series[key]
+
+    def add(self, name: str, model, seconds: float):
+        entry = self._entry(name, model)
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        if bucket < len(self.buckets):
+            entry[3][bucket] += 1
+
+    def rows(self) -> list:
+        return [[name, model, count, total, peak, list(buckets)]
+                for (name, model), (count, total, peak, buckets) in self.series.items()]
+
+    def merge(self, rows: list):
+        for name, model, count, total, peak, buckets in rows:
+            entry = self._entry(name, model)
+            entry[0] += count
+            entry[1] += total
+            entry[2] = max(entry[2], peak)
+            entry[3] = [a + b for a, b in zip(entry[3], buckets)]
+
+
+class Telemetry:
+    """
+    Timing spans for the forecasting pipeline.
+
+    Every span adds its duration to a per-(span, model) histogram, served in
+    Prometheus text format by `render_metrics`. When `log_path` is set it is
+    also appended to that file as one JSON line, together with its attributes
+    (series length, phase, ...) and the pid and thread that ran it. Worker
+    processes append to the same file, so the log covers the whole run.
+
+    Args:
+        log_path: JSON lines file for individual spans (None to disable)
+        profile_dir: Directory for the cProfile dumps written by `profiled` (None to disable)
+    """
+
+    def __init__(self, log_path: str = None, profile_dir: str = None):
+        self.log_path = log_path
+        self.profile_dir = profile_dir
+        self.stats = SpanStats()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._log = None
+        self._log_pid = None
+
+    def _target(self) -> SpanStats:
+        captures = getattr(self._local, 'captures', None)
+        return captures[-1] if captures else self.stats
+
+    @contextmanager
+    def span(self, name: str, model: str = None, **attrs):
+        """
+        Time the block as span `name`. Yields the attribute dict, so the block
+        can add attributes it only learns while running.
+        """
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.perf_counter() - start, model, **attrs)
+
+    def record(self, name: str, seconds: float, model: str = None, **attrs):
+        with self._lock:
+            self._target().add(name, model, seconds)
+        if self.log_path:
+            self._write({'time': time.time(), 'span': name, 'model': model, 'seconds': seconds,
+                         'pid': os.getpid(), 'thread': threading.current_thread().name, **attrs})
+
+    def merge(self, rows: list):
+        """Add SpanStats rows recorded elsewhere, e.g. in a worker process."""
+        with self._lock:
+            self._target().merge(rows)
+
+    @contextmanager
+    def capture(self):
+        """
+        Divert the spans this thread records inside the block into a separate
+        SpanStats, yielded to the caller, instead of the process-wide one.
+        """
+        stats = SpanStats(self.stats.buckets)
+        if not hasattr(self._local, 'captures'):
+            self._local.captures = []
+        self._local.captures.append(stats)
+        try:
+            yield stats
+        finally:
+            self._local.captures.pop()
+
+    def _write(self, event: dict):
+        line = json.dumps(event, default=str) + '\n'
+        with self._lock:
+            # A forked worker reopens the log rather than sharing the parent's buffer
+            if self._log is None or self._log_pid != os.getpid():
+                self._log = open(self.log_path, 'a', buffering=1)
+                self._log_pid = os.getpid()
+            self._log.write(line)
+
+    @contextmanager
+    def profiled(self, name: str):
+        """
+        Run the block under cProfile when `profile_dir` is set, and write the
+        stats to `<profile_dir>/<name>-<pid>-<time>.prof` for pstats or snakeviz.
+        Only the calling process is profiled; the span log's pids and times line
+        up with a `py-spy record` of the workers.
+
+        Yields:
+            The dump path, or None when profiling is off
+        """
+        if not self.profile_dir:
+            yield None
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}-{os.getpid()}-{int(time.time())}.prof")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+
+    def render_metrics(self) -> str:
+        """Span duration histograms in Prometheus text exposition format."""
+        with self._lock:
+            rows = self.stats.rows()
+        metric = 'forecast_span_seconds'
+        lines = [f"# TYPE {metric} histogram"]
+        for name, model, count, total, _, buckets in sorted(rows, key=lambda row: (row[0], row[1] or '')):
+            labels = f'span="{name}"' + (f',model="{model}"' if model else '')
+            cumulative = 0
+            for bound, bucket_count in zip(self.stats.buckets, buckets):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{{labels}}} {total}')
+            lines.append(f'{metric}_count{{{labels}}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes, since start or the last reset_peak_rss."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Lower the peak RSS mark to the current RSS (Linux only), so peak_rss
+    measures the next piece of work rather than the whole process life.
+
+    Returns:
+        False where the mark cannot be reset; peak_rss then keeps the process-wide peak
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+_default_telemetry = None
+
+
+def default_telemetry() -> Telemetry:
+    """
+    Process-wide telemetry used by the pipeline and the metrics endpoint.
+    FORECAST_TELEMETRY_LOG and FORECAST_PROFILE_DIR switch on the span log and
+    per-run profiles.
+    """
+    global _default_telemetry
+    if _default_telemetry is None:
+        _default_telemetry = Telemetry(log_path=os.environ.get('FORECAST_TELEMETRY_LOG'),
+                                       profile_dir=os.environ.get('FORECAST_PROFILE_DIR'))
+    return _default_telemetry
+
+
+def span(name: str, model: str = None, **attrs):
+    """Time a block on the default telemetry (see Telemetry.span)."""
+    return default_telemetry().span(name, model, **attrs)
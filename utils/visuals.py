@@ -1,11 +1,24 @@
 # cap_poc/utils/visuals.py
 
+import base64
+import logging
+
 from dash import dash_table
 from dash import dcc, html
+import plotly.colors
 import plotly.graph_objs as go
 from darts import TimeSeries
 import numpy as np
-from darts import concatenate
+import pandas as pd
+from .downsample import lttb
+
+logger = logging.getLogger(__name__)
+
+# Points per trace when the browser has not reported its width yet
+DEFAULT_MAX_POINTS = 2000
+
+# Line color of each model in the forecast and residual figures; the actuals are black
+MODEL_COLORS = plotly.colors.qualitative.Plotly
 
 
 def format_metric(metric_value):
@@ -26,235 +39,402 @@ def create_metrics_table(metrics: list[dict]):
             'Model': metric['model'],
             'MAPE': format_metric(metric['mape']),
             'RMSE': format_metric(metric['rmse']),
+            'sMAPE': format_metric(metric.get('smape')),
+            'MASE': format_metric(metric.get('mase')),
+            'Status': metric.get('status', ''),
         })
 
+    # Raced runs say which models were pruned and after how many windows
+    columns = ['Model', 'MAPE', 'RMSE', 'sMAPE', 'MASE']
+    if any(row['Status'] for row in data):
+        columns.append('Status')
+
     return dash_table.DataTable(
-        columns=[{"name": i, "id": i} for i in ['Model', 'MAPE', 'RMSE']],
+        columns=[{"name": i, "id": i} for i in columns],
         data=data,
         style_table={'overflowX': 'auto'},
         style_cell={'textAlign': 'center'},
         style_header={'backgroundColor': 'lightgrey', 'fontWeight': 'bold'},
     )
 
-def plot_combined_forecasts(val_truth, val_forecasts, future_forecasts):
+def max_points_for_width(width):
+    """A line trace cannot show more than about two points per horizontal pixel."""
+    if not width:
+        return DEFAULT_MAX_POINTS
+    return max(100, 2 * int(width))
+
+def downsample(x, y, max_points=DEFAULT_MAX_POINTS, even=False):
+    """
+    Reduce a trace to at most `max_points` points with LTTB.
+
+    Args:
+        x: Time index (pandas DatetimeIndex or array)
+        y: Values, same length as x
+        even: Place the kept points evenly over the range of `x`, each at its
+            LTTB bucket's slot instead of its own timestamp. At two points per
+            pixel that moves no point by more than a pixel, and the trace's x
+            values can be sent as a start and step (see time_axis).
+
+    Returns:
+        Tuple (x, y) of the kept points
+    """
+    y = np.asarray(y).ravel()
+    if len(y) <= max_points:
+        return x, y
+    keep = lttb(np.asarray(x), y, max_points)
+    if not even:
+        return x[keep], y[keep]
+    if is_datetime_index(x):
+        return pd.date_range(x[0], x[-1], periods=len(keep)), y[keep]
+    return np.linspace(x[0], x[-1], len(keep)), y[keep]
+
+def clip_range(x, y, x_range=None):
+    """
+    The part of a trace inside `x_range`, plus one point of context on each
+    side so the line runs to the edges of the plot.
+
+    Args:
+        x: Sorted time index (pandas Index or array)
+        y: Values, same length as x
+        x_range: (start, end) of the visible range, or None for everything
+    """
+    if x_range is None:
+        return x, y
+    index = pd.Index(x)
+    if is_datetime_index(index):
+        bounds = [pd.Timestamp(bound) for bound in x_range]
+    else:
+        bounds = [float(bound) for bound in x_range]
+    start = max(0, index.searchsorted(bounds[0]) - 1)
+    end = min(len(index), index.searchsorted(bounds[1], side='right') + 1)
+    return x[start:end], y[start:end]
+
+def series_trace_data(ts, max_points=DEFAULT_MAX_POINTS, even=False, x_range=None):
+    """Downsampled (x, y) arrays of a univariate TimeSeries, optionally only the part inside `x_range`."""
+    x, y = clip_range(ts.time_index, ts.values(copy=False)[:, 0], x_range)
+    return downsample(x, y, max_points, even)
+
+def typed_array(values, dtype=None) -> dict:
+    """
+    Plotly typed array: the raw little-endian bytes of the values in base64,
+    which plotly.js reads straight into a Float64Array (or Float32Array)
+    instead of parsing one JSON number per point.
+
+    Args:
+        values: Numeric array
+        dtype: 'f4' or 'f8'; defaults to 'f4' for float32 values and 'f8' otherwise
+    """
+    values = np.asarray(values)
+    if dtype is None:
+        dtype = 'f4' if values.dtype == np.float32 else 'f8'
+    data = np.ascontiguousarray(values, dtype=f'<{dtype}')
+    return {'dtype': dtype, 'bdata': base64.b64encode(data.tobytes()).decode('ascii')}
+
+def display_dtype(values) -> str:
+    """
+    'f4' when rounding the values to float32 moves none of them by more than
+    1/10000 of their range (far below a pixel), 'f8' otherwise.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 'f4'
+    error = np.abs(finite.astype(np.float32) - finite).max()
+    return 'f4' if error <= 1e-4 * (finite.max() - finite.min()) else 'f8'
+
+def is_datetime_index(x) -> bool:
+    return pd.api.types.is_datetime64_any_dtype(x)
+
+def time_axis(x) -> dict:
+    """
+    Trace arguments for the x values of a time axis.
+
+    Evenly spaced points, such as a forecast, a series short enough to skip
+    downsampling or an `even` downsample, are sent as a start and step (`x0`
+    and `dx`, in milliseconds for dates). Anything else is sent as a typed
+    array of epoch milliseconds. Plotly cannot tell those numbers are dates,
+    so figures set their x axis type to 'date'.
+
+    Args:
+        x: Time index (pandas DatetimeIndex or RangeIndex, or array)
+
+    Returns:
+        Dict with either `x0` and `dx`, or `x`
+    """
+    x = pd.Index(x)
+    dates = is_datetime_index(x)
+    if dates:
+        if getattr(x, 'tz', None) is not None:
+            x = x.tz_localize(None)  # wall-clock times, like the ISO strings plotly would otherwise get
+        values = x.to_numpy().astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+    else:
+        values = x.to_numpy(dtype=np.float64)
+
+    if len(values) > 1:
+        dx = (values[-1] - values[0]) / (len(values) - 1)
+        # Within a millisecond, as date_range rounds evenly spaced timestamps to nanoseconds
+        if dx > 0 and np.abs(values - (values[0] + dx * np.arange(len(values)))).max() <= 1:
+            dx = int(dx) if dx.is_integer() else float(dx)
+            x0 = pd.Timestamp(int(values[0]), unit='ms').isoformat() if dates else float(values[0])
+            return {'x0': x0, 'dx': dx}
+    return {'x': typed_array(values)}
+
+def scatter(x, y, mode='lines', **kwargs) -> go.Scatter:
+    """Line trace with a compact time axis (see time_axis) and typed-array values (see display_dtype)."""
+    return go.Scatter(**time_axis(x), y=typed_array(y, display_dtype(y)), mode=mode, **kwargs)
+
+def plot_time_series(df, max_points=DEFAULT_MAX_POINTS, x_range=None, uirevision=None):
     """
-    Create combined plots showing the validation and future forecasts for each model.
-    
+    Create the data preview figure, downsampled to what the viewport can show.
+
+    Args:
+        df: DataFrame with `date` and `value` columns
+        max_points: Point budget for the trace
+        x_range: Optional (start, end) of the visible range; only that part is
+            sent, at full budget, so zooming in reveals detail
+        uirevision: Keeps the user's zoom across figure updates when unchanged
+
+    Returns:
+        plotly Figure
+    """
+    dates, values = clip_range(df['date'].to_numpy(), df['value'].to_numpy(), x_range)
+    x, y = downsample(dates, values, max_points)
+
+    fig = go.Figure()
+    fig.add_trace(scatter(x, y, name='Time Series Data'))
+    fig.update_layout(
+        title="Time Series Data", 
+        xaxis_title="Date", 
+        yaxis_title="Value",
+        xaxis_type='date',
+        uirevision=uirevision
+    )
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+    return fig
+
+def _model_color(i):
+    return MODEL_COLORS[i % len(MODEL_COLORS)]
+
+def _merge_windows(forecasts):
+    """Join CV window forecasts into one (time index, values) pair in time order."""
+    index = forecasts[0].time_index.append([f.time_index for f in forecasts[1:]])
+    values = np.concatenate([f.values(copy=False)[:, 0] for f in forecasts])
+    order = np.argsort(index.to_numpy(), kind='stable')
+    return index[order], values[order]
+
+def plot_combined_forecasts(val_truth, val_forecasts, future_forecasts, max_points=DEFAULT_MAX_POINTS,
+                            graph_id=None):
+    """
+    Create one figure with the actuals and every model's validation and future forecasts.
+
+    The actuals are sent once for all models. Each model has its own color,
+    and its validation and future traces share a legend group, so clicking
+    the legend shows or hides a model.
+
     Args:
         val_truth: The validation part of the time series (actual values)
         val_forecasts: List of tuples (model_name, forecast) for validation
         future_forecasts: List of tuples (model_name, forecast) for future predictions
-        
+        max_points: Point budget per trace; longer series are downsampled with LTTB
+        graph_id: Component ID of the graph, for zoom callbacks
+
     Returns:
         List of dash graph components
     """
-    figures = []
-    
+    fig = forecast_figure(val_truth, val_forecasts, future_forecasts, max_points)
+    if fig is None:
+        return [html.Div("No forecast plots available. Please check your data and model selection.")]
+    return [dcc.Graph(figure=fig, **({'id': graph_id} if graph_id is not None else {}))]
+
+def forecast_figure(val_truth, val_forecasts, future_forecasts, max_points=DEFAULT_MAX_POINTS, x_range=None):
+    """
+    The figure of plot_combined_forecasts, or None when no model has a forecast to show.
+
+    Args:
+        x_range: Optional (start, end) of the visible range; only that part is
+            sent, at full budget, so zooming in reveals detail
+    """
+    fig = go.Figure()
+    fig.add_trace(scatter(*series_trace_data(val_truth, max_points, even=True, x_range=x_range), name='Actuals',
+                          line=dict(color='black')))
+
     # Create lookup for future forecasts
     future_dict = {clean_model_name(name): forecast for name, forecast in future_forecasts}
-    
-    # Process each model's forecasts
-    for model_name, val_forecast in val_forecasts:
-        print(f"\nCreating combined plot for {model_name}")
-        
+
+    plotted = 0
+    for i, (model_name, val_forecast) in enumerate(val_forecasts):
+        logger.debug("Adding forecast traces for %s", model_name)
+        clean_name = clean_model_name(model_name)
+        style = dict(legendgroup=clean_name, line=dict(color=_model_color(i), dash='dot'))
+
         # Skip if the forecast is None or empty
         if val_forecast is None or len(val_forecast) == 0:
-            print(f"⚠️ Skipping plot for {model_name}: empty forecast")
+            logger.warning("Skipping plot for %s: empty forecast", model_name)
             continue
-            
-        print(f"Type of val_forecast: {type(val_forecast)}")
-        
-        # Create figure for this model
-        fig = go.Figure()
-        # Align val_truth to the same period as the validation forecast
-        
-        # Plot the actuals (validation truth)
-        fig.add_trace(go.Scatter(
-            x=val_truth.time_index, 
-            y=val_truth.values().flatten(),
-            mode='lines',
-            name='Actuals',
-            line=dict(color='black')
-        ))
-        
+
         # Plot the validation forecast(s)
         if isinstance(val_forecast, list):
             # Filter out empty forecasts
             valid_slices = [f for f in val_forecast if f is not None and len(f) > 0]
             if not valid_slices:
-                print(f"⚠️ No valid CV slices for {model_name}")
-                continue
-            try:
-                # Merge all CV forecasts into one TimeSeries
-                merged_forecast = concatenate(valid_slices, ignore_time_axis=False)
-                fig.add_trace(go.Scatter(
-                        x=merged_forecast.time_index,
-                        y=merged_forecast.values().flatten(),
-                        mode='lines',
-                        name=f'{model_name} CV',
-                        line=dict(color='orange', dash='dot'),
-                        opacity=0.6
-                    ))
-            except Exception as e:
-                print(f"⚠️ Error merging CV forecasts for {model_name}: {e}")
+                logger.warning("No valid CV slices for %s", model_name)
                 continue
+            # Windows are strided, so they are joined point by point rather than as contiguous series
+            merged_x, merged_y = downsample(*clip_range(*_merge_windows(valid_slices), x_range), max_points,
+                                            even=True)
+            fig.add_trace(scatter(merged_x, merged_y, name=f'{model_name} CV', opacity=0.6, **style))
         elif isinstance(val_forecast, TimeSeries):
-            fig.add_trace(go.Scatter(
-                x=val_forecast.time_index,
-                y=val_forecast.values().flatten(),
-                mode='lines',
-                name=f'{model_name} Validation',
-                line=dict(color='orange', dash='dot')
-            ))
-        
+            fig.add_trace(scatter(*series_trace_data(val_forecast, max_points, even=True, x_range=x_range),
+                                  name=f'{model_name} Validation',
+                                  **style))
+        else:
+            continue
+        plotted += 1
+
         # Find and plot the future forecast
-        clean_name = clean_model_name(model_name)
         if clean_name in future_dict:
             future_forecast = future_dict[clean_name]
-            print(f"Future forecast time range: {future_forecast.start_time()} - {future_forecast.end_time()}")
-            
-            # Plot the future forecast
-            fig.add_trace(go.Scatter(
-                x=future_forecast.time_index,
-                y=future_forecast.values().flatten(),
-                mode='lines',
-                name=f'{clean_name} Future Forecast',
-                line=dict(color='blue')
-            ))
-        
-        # Update layout and add the figure
-        fig.update_layout(
-            title=f"Forecast Plot - {model_name}",
-            xaxis_title="Date",
-            yaxis_title="Value",
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        figures.append(dcc.Graph(figure=fig))
-    
-    return figures if figures else [html.Div("No forecast plots available. Please check your data and model selection.")]
-
-def plot_residuals(actual_ts, forecast_ts, model_name):
+            logger.debug("Future forecast time range: %s - %s", future_forecast.start_time(), future_forecast.end_time())
+            fig.add_trace(scatter(*series_trace_data(future_forecast, max_points, even=True, x_range=x_range),
+                                  name=f'{clean_name} Future Forecast', legendgroup=clean_name,
+                                  line=dict(color=_model_color(i))))
+
+    if not plotted:
+        return None
+
+    fig.update_layout(
+        title="Forecast Plot",
+        xaxis_title="Date",
+        yaxis_title="Value",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        uirevision='forecast'
+    )
+    if is_datetime_index(val_truth.time_index):
+        fig.update_xaxes(type='date')
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+    return fig
+
+def plot_residuals(actual_ts, val_forecasts, max_points=DEFAULT_MAX_POINTS, graph_id=None):
     """
-    Create residual plots for a model's forecast(s).
-    
+    Create one residual figure for all models' validation or CV forecasts.
+
+    Each model is one trace; the windows of a CV forecast are joined into it
+    with a gap between consecutive windows.
+
     Args:
         actual_ts: The actual time series values (TimeSeries)
-        forecast_ts: A single TimeSeries or list of TimeSeries (e.g., from CV)
-        model_name: Name of the model
-        
+        val_forecasts: List of tuples (model_name, forecast), where a forecast is
+            a single TimeSeries or a list of TimeSeries (e.g., from CV)
+        max_points: Point budget per window; longer residual series are downsampled
+        graph_id: Component ID of the graph, for zoom callbacks
+
     Returns:
         A dash graph component
     """
-    print(f"\nCreating residuals plot for {model_name}")
+    fig = residual_figure(actual_ts, val_forecasts, max_points)
+    if fig is None:
+        return html.Div("No overlapping data between the forecasts and actuals")
+    return dcc.Graph(figure=fig, **({'id': graph_id} if graph_id is not None else {}))
+
+def residual_figure(actual_ts, val_forecasts, max_points=DEFAULT_MAX_POINTS, x_range=None):
+    """
+    The figure of plot_residuals, or None when no forecast overlaps the actuals.
+
+    Args:
+        x_range: Optional (start, end) of the visible range; only that part is
+            sent, at full budget, so zooming in reveals detail
+    """
+    fig = go.Figure()
+    cross_validated = False
+    for i, (model_name, forecast_ts) in enumerate(val_forecasts):
+        logger.debug("Adding residuals for %s", model_name)
 
-    # Handle cross-validation forecasts
-    if isinstance(forecast_ts, list):
-        fig = go.Figure()
-        for i, forecast_slice in enumerate(forecast_ts):
+        # Handle cross-validation forecasts
+        if isinstance(forecast_ts, list):
+            cross_validated = True
+            slices = forecast_ts
+        elif isinstance(forecast_ts, TimeSeries):
+            slices = [forecast_ts]
+        else:
+            logger.warning("Invalid forecast data type for %s", model_name)
+            continue
+
+        xs, ys = [], []
+        for fold, forecast_slice in enumerate(slices):
             if forecast_slice is None or len(forecast_slice) == 0:
-                print(f"⚠️ Empty forecast slice at CV fold {i+1}")
+                logger.warning("Empty forecast slice at CV fold %d for %s", fold + 1, model_name)
                 continue
 
             # Align each slice with actual_ts
-            overlap_start = max(actual_ts.start_time(), forecast_slice.start_time())
-            overlap_end = min(actual_ts.end_time(), forecast_slice.end_time())
-            
-            if overlap_start > overlap_end:
+            x_vals, residuals = align_residuals(actual_ts, forecast_slice)
+            if len(x_vals) == 0:
                 continue
-            
-            actual_aligned = actual_ts.slice(overlap_start, overlap_end)
-            forecast_aligned = forecast_slice.slice(overlap_start, overlap_end)
-
-            if len(actual_aligned) != len(forecast_aligned):
-                common_dates = sorted(set(actual_aligned.time_index).intersection(set(forecast_aligned.time_index)))
-                if not common_dates:
-                    continue
-
-                actual_values = [actual_aligned[date].values()[0][0] for date in common_dates]
-                forecast_values = [forecast_aligned[date].values()[0][0] for date in common_dates]
-                residuals = np.array(actual_values) - np.array(forecast_values)
-                x_vals = common_dates
-            else:
-                residuals = (actual_aligned - forecast_aligned).values().flatten()
-                x_vals = actual_aligned.time_index
-
-            fig.add_trace(go.Scatter(
-                x=x_vals,
-                y=residuals,
-                mode='lines+markers',
-                name=f'CV Residual {i+1}',
-                opacity=0.6
-            ))
-
-        fig.add_shape(
-            type="line", x0=min(x_vals), x1=max(x_vals), y0=0, y1=0,
-            line=dict(color="red", width=1, dash="dash")
-        )
-
-        fig.update_layout(
-            title=f"Residuals (CV): {model_name}",
-            xaxis_title="Date",
-            yaxis_title="Error (Actual - Forecast)"
-        )
-        return dcc.Graph(figure=fig)
-
-    # Handle single forecast
-    elif isinstance(forecast_ts, TimeSeries):
-        # Original implementation here (no changes needed)
-        actual_start = actual_ts.start_time()
-        actual_end = actual_ts.end_time()
-        forecast_start = forecast_ts.start_time()
-        forecast_end = forecast_ts.end_time()
-        
-        overlap_start = max(actual_start, forecast_start)
-        overlap_end = min(actual_end, forecast_end)
-        
-        if overlap_start > overlap_end:
-            return html.Div(f"No overlapping data between {model_name} forecast and actuals")
-        
-        actual_aligned = actual_ts.slice(overlap_start, overlap_end)
-        forecast_aligned = forecast_ts.slice(overlap_start, overlap_end)
-        
-        if len(actual_aligned) != len(forecast_aligned):
-            common_dates = sorted(set(actual_aligned.time_index).intersection(set(forecast_aligned.time_index)))
-            if not common_dates:
-                return html.Div(f"No common dates found between actual and forecast for {model_name}")
-            actual_values = [actual_aligned[date].values()[0][0] for date in common_dates]
-            forecast_values = [forecast_aligned[date].values()[0][0] for date in common_dates]
-            residuals = np.array(actual_values) - np.array(forecast_values)
-            x_vals = common_dates
-        else:
-            residuals = (actual_aligned - forecast_aligned).values().flatten()
-            x_vals = actual_aligned.time_index
+            x_vals, residuals = clip_range(x_vals, residuals, x_range)
+            if len(x_vals) == 0:
+                continue
+            x_vals, residuals = downsample(x_vals, residuals, max_points, even=True)
+            if xs:
+                # A NaN residual keeps plotly from drawing a line across to the next window
+                xs.append(xs[-1][-1:])
+                ys.append([np.nan])
+            xs.append(x_vals)
+            ys.append(residuals)
 
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=x_vals,
-            y=residuals,
+        if not xs:
+            if x_range is None:
+                logger.warning("No common dates found between actual and forecast for %s", model_name)
+            continue
+        fig.add_trace(scatter(
+            xs[0].append(xs[1:]),
+            np.concatenate(ys),
             mode='lines+markers',
-            name='Residuals'
+            name=model_name,
+            line=dict(color=_model_color(i)),
+            opacity=0.6 if cross_validated else None
         ))
 
-        fig.add_shape(
-            type="line", x0=min(x_vals), x1=max(x_vals), y0=0, y1=0,
-            line=dict(color="red", width=1, dash="dash")
-        )
+    if not fig.data:
+        return None
 
-        fig.update_layout(
-            title=f"Residuals: {model_name}",
-            xaxis_title="Date",
-            yaxis_title="Error (Actual - Forecast)"
-        )
-        return dcc.Graph(figure=fig)
+    fig.add_hline(y=0, line=dict(color="red", width=1, dash="dash"))
+    fig.update_layout(
+        title="Residuals (CV)" if cross_validated else "Residuals",
+        xaxis_title="Date",
+        yaxis_title="Error (Actual - Forecast)",
+        uirevision='residuals'
+    )
+    if is_datetime_index(actual_ts.time_index):
+        fig.update_xaxes(type='date')
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+    return fig
 
-    else:
-        return html.Div(f"Invalid forecast data type for {model_name}")
+def align_residuals(actual_ts, forecast_ts):
+    """
+    Join two series on their common timestamps and return the residuals.
+
+    Works on the underlying index and value arrays, so no per-point TimeSeries
+    objects are built regardless of how the two series overlap.
+
+    Returns:
+        Tuple (common time index, numpy array of actual - forecast)
+    """
+    actual_index = actual_ts.time_index
+    forecast_index = forecast_ts.time_index
+    common = actual_index.intersection(forecast_index, sort=False)
+    if not common.is_monotonic_increasing:
+        common = common.sort_values()
+    actual_values = actual_ts.values(copy=False)[actual_index.get_indexer(common), 0]
+    forecast_values = forecast_ts.values(copy=False)[forecast_index.get_indexer(common), 0]
+    return common, actual_values - forecast_values
 
 def clean_model_name(name):
     """Removes ' (CV)' from model name for matching future forecasts."""